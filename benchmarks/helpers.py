@@ -0,0 +1,132 @@
+import json
+import random
+
+from minecraft import SUPPORTED_MINECRAFT_VERSIONS
+from minecraft.networking.connection import ConnectionContext
+from minecraft.networking.packets import clientbound
+from minecraft.networking.types import Vector
+
+from autofish.capture import ReplayConnection
+from autofish.config import DEFAULT_OPTIONS
+from autofish.fishing import register_listeners
+from autofish.state import SessionState
+
+# Pin the version so results stay comparable between runs
+VERSION = "1.16.4"
+SPLASH_ID = 73
+
+# Share of each kind of packet in a generated stream. Most packets the server
+# sends are of no interest to autofish
+STREAM_MIX = (
+    ("time_update", 0.55),
+    ("keep_alive", 0.05),
+    ("other_sound", 0.33),
+    ("splash", 0.02),
+    ("chat", 0.05),
+)
+
+
+def create_context():
+    return ConnectionContext(protocol_version=SUPPORTED_MINECRAFT_VERSIONS[VERSION])
+
+
+def dispatch(connection, packets):
+    """Call the listeners of `connection` for every decoded packet in `packets`"""
+    listeners = connection.listeners
+    for packet in packets:
+        for listener in listeners.get(type(packet), ()):
+            listener(packet)
+
+
+def record_throughput(benchmark, packets):
+    """Store the number of packets handled per round, and per second if measured"""
+    benchmark.extra_info["packets"] = packets
+    # No stats are collected with --benchmark-disable
+    if benchmark.stats is not None:
+        benchmark.extra_info["packets_per_second"] = packets / benchmark.stats["mean"]
+
+
+def create_session(options_override={}):
+    """Return a (state, connection) pair, with the fishing listeners registered"""
+    options = {
+        **DEFAULT_OPTIONS,
+        "username": "benchfisher",
+        # Measure every command instead of the cooldown
+        "command_cooldown": 0,
+        **options_override,
+    }
+    state = SessionState(options, SPLASH_ID)
+    state.connection = ReplayConnection(create_context())
+    state.set_flags(connected=True)
+    register_listeners(state.connection, state)
+    return state, state.connection
+
+
+def sound_effect(context, sound_id):
+    return clientbound.play.SoundEffectPacket(
+        context,
+        sound_id=sound_id,
+        sound_category=0,
+        effect_position=Vector(0, 64, 0),
+        volume=1.0,
+        pitch=1.0,
+    )
+
+
+def chat_message(context, name, message):
+    return clientbound.play.ChatMessagePacket(
+        context,
+        json_data=json.dumps(
+            {
+                "translate": "chat.type.text",
+                "with": [{"insertion": name, "text": name}, message],
+            }
+        ),
+        position=clientbound.play.ChatMessagePacket.Position.CHAT,
+        sender="00000000-0000-0000-0000-000000000000",
+    )
+
+
+def make_packet(context, kind, rng):
+    if kind == "time_update":
+        return clientbound.play.TimeUpdatePacket(
+            context, world_age=rng.randrange(1 << 32), time_of_day=rng.randrange(24000)
+        )
+    if kind == "keep_alive":
+        return clientbound.play.KeepAlivePacket(
+            context, keep_alive_id=rng.randrange(1 << 32)
+        )
+    if kind == "other_sound":
+        return sound_effect(context, rng.choice((SPLASH_ID - 1, SPLASH_ID + 1)))
+    if kind == "splash":
+        return sound_effect(context, SPLASH_ID)
+    if kind == "chat":
+        return chat_message(context, "player", "hello there")
+    raise ValueError(f"Unknown packet kind {kind}")
+
+
+def make_stream(context, count, seed=0):
+    """Return a reproducible list of `count` packets mixed as in `STREAM_MIX`"""
+    rng = random.Random(seed)
+    kinds, weights = zip(*STREAM_MIX)
+    return [
+        make_packet(context, kind, rng)
+        for kind in rng.choices(kinds, weights=weights, k=count)
+    ]
+
+
+class _Sink:
+    def __init__(self):
+        self.data = bytearray()
+
+    def send(self, data):
+        self.data += data
+
+
+def encode_stream(context, packets, compression_threshold=None):
+    """Return `packets` framed as the server would send them"""
+    sink = _Sink()
+    for packet in packets:
+        packet.context = context
+        packet.write(sink, compression_threshold)
+    return bytes(sink.data)
@@ -0,0 +1,395 @@
+"""
+Load test autofish with many concurrent sessions
+
+Runs N sessions for each N given against the stand-in server in
+`tests/fakeserver.py`, either all in one autofish process ("inprocess", like a
+config with several sessions) or with one process per session ("subprocess").
+The server plays the bobber splash to each session at random with the given
+rate, and measures the time until the session reels in. Thread count, memory
+and CPU time are read from /proc for the autofish processes only, so the server
+and the harness don't skew the results. Requires Linux.
+
+    python -m benchmarks.loadtest --sessions 1 10 50 200 --output scaling.csv
+"""
+
+import csv
+import json
+import os
+import random
+import sys
+import threading
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+
+from autofish.timing import Histogram
+from autofish.versions import LATEST_RELEASE_VERSION
+from tests.fakeserver import FakeServer
+from tests.helpers import prepare_splash_id, start_client, stop_client
+
+# Keep the sessions quiet and casting until they get a bite
+OPTIONS_OVERRIDE = {
+    "print_output": False,
+    "greet_message": "",
+    "sleep_helper": False,
+    "fish_timeout": 3600,
+}
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+FIELDS = (
+    "sessions",
+    "mode",
+    "engine",
+    "duration",
+    "bites",
+    "catches",
+    "latency_p50_ms",
+    "latency_p90_ms",
+    "latency_p99_ms",
+    "latency_max_ms",
+    "cpu_seconds",
+    "cpu_percent_per_session",
+    "peak_threads",
+    "peak_rss_mb",
+    "rss_mb_per_session",
+)
+
+
+def get_options():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+
+    parser.add_argument(
+        "-n",
+        "--sessions",
+        help="Numbers of concurrent sessions to measure",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50],
+    )
+    parser.add_argument(
+        "--mode",
+        help=(
+            "'inprocess' runs every session in one autofish process, "
+            "'subprocess' starts one autofish process per session"
+        ),
+        choices=("inprocess", "subprocess"),
+        default="inprocess",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        help="Networking engine of the autofish processes",
+        choices=("threaded", "asyncio"),
+        default="threaded",
+    )
+    parser.add_argument(
+        "--version", help="Minecraft version to serve", default=LATEST_RELEASE_VERSION
+    )
+    parser.add_argument(
+        "-d",
+        "--duration",
+        help="Seconds to measure for at each number of sessions",
+        type=float,
+        default=30,
+    )
+    parser.add_argument(
+        "--bite-rate",
+        help="Average number of bites per second for each session",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "--startup-timeout",
+        help="Seconds to wait for every session to connect and cast",
+        type=float,
+        default=120,
+    )
+    parser.add_argument("--seed", help="Seed for the bite times", type=int, default=0)
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Write the results to this .csv or .json file",
+        default=None,
+    )
+
+    return parser.parse_args()
+
+
+def read_status(pid):
+    """Return a tuple (threads, resident bytes) for the process `pid`"""
+    threads = rss = 0
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                threads = int(line.split()[1])
+            elif line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) * 1024
+    return threads, rss
+
+
+def read_cpu_seconds(pid):
+    """Return the user+system CPU time used by the process `pid`"""
+    with open(f"/proc/{pid}/stat", "r") as f:
+        # The process name may contain spaces, so split after it
+        fields = f.read().rpartition(")")[2].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    return (utime + stime) / CLOCK_TICKS
+
+
+class ResourceSampler(threading.Thread):
+    """Records the peak thread count and memory use of a set of processes"""
+
+    def __init__(self, pids, interval=0.25):
+        super().__init__(name="loadtest-sampler", daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self.stopped = threading.Event()
+
+    def sample(self):
+        threads = rss = 0
+        for pid in self.pids:
+            try:
+                pid_threads, pid_rss = read_status(pid)
+            except OSError:
+                # The process has exited
+                continue
+            threads += pid_threads
+            rss += pid_rss
+        self.peak_threads = max(self.peak_threads, threads)
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def run(self):
+        self.sample()
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class BiteDriver(threading.Thread):
+    """
+    Plays the bobber splash to every player of `server` at random times
+
+    The time between the bites of a player is exponentially distributed with
+    mean 1/`rate`. The latency from sending a splash to the player using its
+    rod is recorded in `latencies`. A player only gets a new bite once it has
+    reeled in the previous one.
+    """
+
+    def __init__(self, server, splash_id, rate, seed=0, tick=0.005):
+        super().__init__(name="loadtest-driver", daemon=True)
+        self.server = server
+        self.splash_id = splash_id
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.tick = tick
+        self.bites = 0
+        self.latencies = Histogram()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def on_use_item(self, player):
+        """Called by the server whenever a player uses its rod"""
+        now = perf_counter()
+        with self.lock:
+            sent = self.pending.pop(player.name, None)
+            if sent is not None:
+                self.latencies.record(now - sent)
+
+    def run(self):
+        next_bite = {}
+        while not self.stopped.wait(self.tick):
+            now = perf_counter()
+            with self.server.changed:
+                players = [
+                    player
+                    for player in self.server.players.values()
+                    if player.connected and player.use_item_count > 0
+                ]
+
+            for player in players:
+                due = next_bite.setdefault(
+                    player.name, now + self.rng.expovariate(self.rate)
+                )
+                if due > now:
+                    continue
+
+                with self.lock:
+                    if player.name in self.pending:
+                        continue
+                    self.pending[player.name] = perf_counter()
+                    self.bites += 1
+
+                player.play_sound(self.splash_id)
+                next_bite[player.name] = now + self.rng.expovariate(self.rate)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def start_clients(server, client_root, count, options):
+    """
+    Start autofish processes running `count` sessions between them
+
+    Returns a tuple (processes, splash_id).
+    """
+    extra_args = ("--engine", options.engine, "--log-level", "warning")
+    # Let every session connect right away
+    host_override = {"connect_rate": 1000, "connect_burst": count}
+
+    if options.mode == "inprocess":
+        client_dirs = [client_root]
+        sessions = [[{"options": {"username": f"bot{i}"}} for i in range(count)]]
+        options_overrides = [OPTIONS_OVERRIDE]
+    else:
+        client_dirs = [client_root / f"bot{i}" for i in range(count)]
+        sessions = [()] * count
+        options_overrides = [
+            {**OPTIONS_OVERRIDE, "username": f"bot{i}"} for i in range(count)
+        ]
+
+    processes = []
+    for client_dir, client_sessions, options_override in zip(
+        client_dirs, sessions, options_overrides
+    ):
+        client_dir.mkdir(exist_ok=True)
+        splash_id = prepare_splash_id(client_dir, server.version)
+        processes.append(
+            start_client(
+                client_dir,
+                server,
+                host_override=host_override,
+                options_override=options_override,
+                extra_args=extra_args,
+                sessions=client_sessions,
+            )
+        )
+
+    return processes, splash_id
+
+
+def measure(count, options):
+    """Run `count` sessions for the configured duration and return the results"""
+    with TemporaryDirectory() as client_root, FakeServer(
+        version=options.version
+    ) as server:
+        processes, splash_id = start_clients(server, Path(client_root), count, options)
+        try:
+            server.wait_for(
+                lambda: sum(
+                    player.connected and player.use_item_count > 0
+                    for player in server.players.values()
+                )
+                >= count,
+                options.startup_timeout,
+            )
+
+            pids = [process.pid for process in processes]
+            sampler = ResourceSampler(pids)
+            driver = BiteDriver(server, splash_id, options.bite_rate, options.seed)
+            server.on_use_item = driver.on_use_item
+
+            cpu_start = sum(read_cpu_seconds(pid) for pid in pids)
+            sampler.start()
+            driver.start()
+            sleep(options.duration)
+            driver.stop()
+            sampler.stop()
+            cpu_seconds = sum(read_cpu_seconds(pid) for pid in pids) - cpu_start
+        finally:
+            for process in processes:
+                stop_client(process)
+
+    latencies = driver.latencies
+
+    def milliseconds(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "sessions": count,
+        "mode": options.mode,
+        "engine": options.engine,
+        "duration": options.duration,
+        "bites": driver.bites,
+        "catches": latencies.total,
+        "latency_p50_ms": milliseconds(latencies.percentile(50)),
+        "latency_p90_ms": milliseconds(latencies.percentile(90)),
+        "latency_p99_ms": milliseconds(latencies.percentile(99)),
+        "latency_max_ms": milliseconds(latencies.max),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "cpu_percent_per_session": round(
+            100 * cpu_seconds / options.duration / count, 3
+        ),
+        "peak_threads": sampler.peak_threads,
+        "peak_rss_mb": round(sampler.peak_rss / 2**20, 1),
+        "rss_mb_per_session": round(sampler.peak_rss / 2**20 / count, 2),
+    }
+
+
+def write_results(rows, path):
+    """Write `rows` to `path` as csv or json depending on the extension"""
+    with open(path, "w", newline="") as f:
+        if path.endswith(".json"):
+            json.dump(rows, f, indent=4)
+        else:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def print_results(rows):
+    widths = [max(len(field), 10) for field in FIELDS]
+    print("  ".join(field.rjust(width) for field, width in zip(FIELDS, widths)))
+    for row in rows:
+        print(
+            "  ".join(
+                str("-" if row[field] is None else row[field]).rjust(width)
+                for field, width in zip(FIELDS, widths)
+            )
+        )
+
+
+def main():
+    options = get_options()
+
+    if not os.path.isdir("/proc"):
+        print("The load test reads resource usage from /proc, which requires Linux")
+        sys.exit(1)
+
+    # start_client changes the working directory
+    cwd = os.getcwd()
+    output = None if options.output is None else os.path.abspath(options.output)
+
+    rows = []
+    try:
+        for count in options.sessions:
+            print(f"Measuring {count} sessions", file=sys.stderr)
+            try:
+                rows.append(measure(count, options))
+            except TimeoutError:
+                print(
+                    f"Not every session of {count} connected within "
+                    f"{options.startup_timeout} seconds",
+                    file=sys.stderr,
+                )
+                break
+    finally:
+        os.chdir(cwd)
+
+    print_results(rows)
+
+    if output is not None:
+        write_results(rows, output)
+        print(f"Wrote the results to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
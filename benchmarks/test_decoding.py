@@ -0,0 +1,66 @@
+"""Benchmark reading packets off the wire in the asyncio engine"""
+
+import asyncio
+
+import pytest
+from minecraft.networking.packets import clientbound
+
+from autofish.aio import AsyncConnection
+from autofish.fishing import register_listeners
+
+from .helpers import (
+    VERSION,
+    create_context,
+    create_session,
+    encode_stream,
+    make_stream,
+    record_throughput,
+)
+
+STREAM_LENGTH = 10000
+
+
+@pytest.fixture(scope="module")
+def stream():
+    return make_stream(create_context(), STREAM_LENGTH)
+
+
+def create_reader(data, count, compression_threshold, extra):
+    """
+    Return a function reading `count` packets from `data`
+
+    Only the packets the fishing listeners and `extra` are interested in are
+    decoded.
+    """
+    state, _ = create_session()
+    connection = AsyncConnection("localhost", 25565, VERSION, "benchfisher")
+    connection.compression_threshold = compression_threshold
+    register_listeners(connection, state)
+    packet_types = connection._packet_types(clientbound.play, extra=extra)
+
+    async def read_all():
+        connection.reader = asyncio.StreamReader()
+        connection.reader.feed_data(data)
+        connection.reader.feed_eof()
+        for _ in range(count):
+            await connection._read_packet(packet_types)
+
+    return lambda: asyncio.run(read_all())
+
+
+@pytest.mark.parametrize("compression_threshold", (None, 64))
+@pytest.mark.parametrize("decode", ("listeners", "all"))
+def test_read_packets(benchmark, stream, compression_threshold, decode):
+    """
+    Throughput of framing, decompressing and decoding a stream of packets
+
+    With `decode` set to "listeners" only the packets autofish listens to are
+    decoded, like in the asyncio engine. "all" decodes every packet, like pyCraft.
+    """
+    data = encode_stream(create_context(), stream, compression_threshold)
+    extra = {type(packet) for packet in stream} if decode == "all" else ()
+
+    benchmark(create_reader(data, len(stream), compression_threshold, extra))
+
+    record_throughput(benchmark, len(stream))
+    benchmark.extra_info["bytes"] = len(data)
@@ -0,0 +1,86 @@
+"""Benchmark the event listeners in `autofish.fishing`"""
+
+import pytest
+from minecraft.networking.packets import clientbound
+
+from autofish.capture import PLAY, encode_packet, replay
+from autofish.fishing import handle_chat, handle_join_game, handle_sound_play
+
+from .helpers import (
+    SPLASH_ID,
+    chat_message,
+    create_context,
+    create_session,
+    dispatch,
+    make_stream,
+    record_throughput,
+    sound_effect,
+)
+
+STREAM_LENGTH = 10000
+
+
+@pytest.fixture(scope="module")
+def context():
+    return create_context()
+
+
+@pytest.fixture(scope="module")
+def stream(context):
+    return make_stream(context, STREAM_LENGTH)
+
+
+def test_replay_stream(benchmark, stream):
+    """Throughput of the listeners for a typical mix of packets"""
+    state, connection = create_session()
+
+    benchmark(dispatch, connection, stream)
+
+    record_throughput(benchmark, len(stream))
+
+
+def test_replay_capture(benchmark, context, stream):
+    """Throughput of replaying a capture, decoding the packets with a listener"""
+    frames = [(0.0, PLAY, encode_packet(packet)) for packet in stream]
+
+    def replay_frames():
+        state, _ = create_session()
+        replay(frames, state, context)
+
+    benchmark(replay_frames)
+
+    record_throughput(benchmark, len(frames))
+
+
+def test_handle_sound_play_splash(benchmark, context):
+    """Latency from receiving a splash to having reeled in and cast again"""
+    state, _ = create_session()
+    packet = sound_effect(context, SPLASH_ID)
+
+    benchmark(handle_sound_play, packet, state)
+
+    assert state.amount_caught > 0
+
+
+def test_handle_sound_play_other(benchmark, context):
+    state, _ = create_session()
+    packet = sound_effect(context, SPLASH_ID + 1)
+
+    benchmark(handle_sound_play, packet, state)
+
+    assert state.amount_caught == 0
+
+
+@pytest.mark.parametrize("message", ("hello there", "sleep"))
+def test_handle_chat(benchmark, context, message):
+    state, _ = create_session({"sleep_command": "sleep"})
+    packet = chat_message(context, "player", message)
+
+    benchmark(handle_chat, packet, state)
+
+
+def test_handle_join_game(benchmark, context):
+    state, _ = create_session()
+    packet = clientbound.play.JoinGamePacket(context)
+
+    benchmark(handle_join_game, packet, state)
@@ -0,0 +1,474 @@
+"""
+Fishing engine running many sessions on a single asyncio event loop.
+
+pyCraft starts a networking thread for every connection. This module instead
+implements the small part of the protocol autofish needs on top of asyncio
+streams, while reusing the packet definitions from pyCraft and the event listeners
+in `autofish.fishing`. Only servers in offline mode are supported, as encryption
+is not implemented.
+"""
+
+import asyncio
+import sys
+import zlib
+from functools import partial
+
+from minecraft import SUPPORTED_MINECRAFT_VERSIONS
+from minecraft.networking.connection import ConnectionContext
+from minecraft.networking.packets import PacketBuffer, clientbound, serverbound
+from minecraft.networking.types import VarInt
+
+from autofish.backoff import TRANSIENT_ERRORS, Backoff, host_bucket
+from autofish.capture import LOGIN, PLAY
+from autofish.eventlog import RECONNECT, log_event
+from autofish.fishing import handle_exception, register_listeners
+from autofish.log import logger
+from autofish.login import get_host_address
+from autofish.session import (
+    EndFishingSession,
+    end_session,
+    handle_wait_result,
+    update_fish_timeout,
+)
+
+# Value of `next_state` in the handshake that starts the login sequence
+LOGIN_STATE = 2
+
+
+async def _read_varint(reader):
+    """Read a VarInt from the stream `reader`"""
+    number = 0
+    for i in range(5):
+        byte = (await reader.readexactly(1))[0]
+        number |= (byte & 0x7F) << 7 * i
+        if not byte & 0x80:
+            return number
+
+    raise ValueError("VarInt is too big")
+
+
+def _decode_varint(data, offset=0):
+    """Decode a VarInt at `offset` in `data`. Return the value and the next offset"""
+    number = 0
+    for i in range(5):
+        byte = data[offset + i]
+        number |= (byte & 0x7F) << 7 * i
+        if not byte & 0x80:
+            return number, offset + i + 1
+
+    raise ValueError("VarInt is too big")
+
+
+class AsyncWakeup:
+    """
+    Stand-in for the `threading.Condition` in the session state
+
+    Lets the event listeners wake up a session waiting on the event loop.
+    """
+
+    def __init__(self):
+        self._event = asyncio.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def notify_all(self):
+        self._event.set()
+
+    async def wait_for(self, predicate, timeout):
+        """Wait until `predicate` is true or `timeout` seconds have passed"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not predicate():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return predicate()
+
+        return True
+
+
+class AsyncConnection:
+    """
+    Client connection implementing the subset of the protocol autofish uses
+
+    Mirrors the parts of the interface of pyCraft's `Connection` that the event
+    listeners rely on.
+    """
+
+    def __init__(
+        self,
+        address,
+        port,
+        version,
+        username,
+        handle_exception=None,
+        counters=None,
+        recording=None,
+    ):
+        self.address = address
+        self.port = port
+        self.username = username
+        self.handle_exception = handle_exception
+        self.context = ConnectionContext(
+            protocol_version=SUPPORTED_MINECRAFT_VERSIONS[version]
+        )
+
+        self.compression_threshold = None
+        self.listeners = {}
+        self.reader = None
+        self.writer = None
+        self.closed = False
+
+        # Counts the packets received, and those dropped without being decoded,
+        # through `counters.increment` if given
+        self.counters = counters
+
+        # Every frame read is written to `recording` if given
+        self.recording = recording
+        self.playing = False
+
+    def _count(self, counter, amount=1):
+        if self.counters is not None:
+            self.counters.increment(counter, amount)
+
+    def register_packet_listener(self, method, *packet_types):
+        for packet_type in packet_types:
+            self.listeners.setdefault(packet_type, []).append(method)
+
+    def send(self, data):
+        """Write raw data to the server. Used by pyCraft's `Packet.write`"""
+        self.writer.write(data)
+
+    def write_packet(self, packet):
+        if self.writer is None or self.writer.is_closing():
+            return
+
+        packet.context = self.context
+        packet.write(self, self.compression_threshold)
+
+    def disconnect(self, immediate=False):
+        self.closed = True
+        if self.writer is not None:
+            self.writer.close()
+
+    def _packet_types(self, packets, extra=()):
+        """Return a mapping id->packet for the packets in `packets` we care about"""
+        wanted = set(self.listeners) | set(extra)
+        return {
+            packet.get_id(self.context): packet
+            for packet in packets.get_packets(self.context)
+            if packet in wanted
+        }
+
+    async def _read_packet(self, packet_types):
+        """
+        Read one packet, returning None if its type is not in `packet_types`
+
+        Only the first few bytes of a packet are decompressed to find its id, so
+        packets we don't care about are skipped without being decompressed or
+        parsed.
+        """
+        length = await _read_varint(self.reader)
+        data = await self.reader.readexactly(length)
+        self._count("packets_received")
+
+        offset = 0
+        compressed = False
+        if self.compression_threshold is not None:
+            decompressed_size, offset = _decode_varint(data)
+            compressed = decompressed_size > 0
+
+        if self.recording is not None:
+            frame = data[offset:]
+            if compressed:
+                frame = zlib.decompress(frame)
+            self.recording.write(PLAY if self.playing else LOGIN, frame)
+
+        if compressed:
+            decompressor = zlib.decompressobj()
+            # A VarInt is at most 5 bytes long
+            head = decompressor.decompress(memoryview(data)[offset:], 5)
+        else:
+            head = data[offset : offset + 5]
+
+        packet_type = packet_types.get(_decode_varint(head)[0])
+        if packet_type is None:
+            self._count("packets_skipped")
+            self._count("bytes_skipped", length)
+            return None
+
+        if compressed:
+            payload = (
+                head
+                + decompressor.decompress(decompressor.unconsumed_tail)
+                + decompressor.flush()
+            )
+        else:
+            payload = data[offset:]
+
+        buffer = PacketBuffer()
+        buffer.send(payload)
+        buffer.reset_cursor()
+
+        # Skip the packet id
+        VarInt.read(buffer)
+
+        packet = packet_type(self.context)
+        packet.read(buffer)
+        return packet
+
+    def _dispatch(self, packet):
+        for listener in self.listeners.get(type(packet), ()):
+            listener(packet)
+
+    async def connect(self):
+        """Open the connection and start the login sequence"""
+        self.reader, self.writer = await asyncio.open_connection(
+            self.address, self.port
+        )
+
+        handshake = serverbound.handshake.HandShakePacket()
+        handshake.protocol_version = self.context.protocol_version
+        handshake.server_address = self.address
+        handshake.server_port = self.port
+        handshake.next_state = LOGIN_STATE
+        self.write_packet(handshake)
+
+        login_start = serverbound.login.LoginStartPacket()
+        login_start.name = self.username
+        self.write_packet(login_start)
+
+    async def _login(self):
+        """Read packets until the login has succeeded. Return False on failure"""
+        packet_types = self._packet_types(
+            clientbound.login,
+            extra=(
+                clientbound.login.SetCompressionPacket,
+                clientbound.login.LoginSuccessPacket,
+                clientbound.login.EncryptionRequestPacket,
+            ),
+        )
+
+        while not self.closed:
+            packet = await self._read_packet(packet_types)
+            if packet is None:
+                continue
+
+            if isinstance(packet, clientbound.login.SetCompressionPacket):
+                self.compression_threshold = packet.threshold
+            elif isinstance(packet, clientbound.login.EncryptionRequestPacket):
+                raise RuntimeError(
+                    "The server requested encryption, which is not supported by "
+                    "the asyncio engine. Is the server in offline mode?"
+                )
+            elif isinstance(packet, clientbound.login.LoginSuccessPacket):
+                return True
+            else:
+                self._dispatch(packet)
+
+        return False
+
+    def _respond(self, packet):
+        """Answer the packets the server requires a response to"""
+        if isinstance(packet, clientbound.play.KeepAlivePacket):
+            keep_alive = serverbound.play.KeepAlivePacket()
+            keep_alive.keep_alive_id = packet.keep_alive_id
+            self.write_packet(keep_alive)
+        elif isinstance(packet, clientbound.play.PlayerPositionAndLookPacket):
+            if self.context.protocol_later_eq(107):
+                teleport_confirm = serverbound.play.TeleportConfirmPacket()
+                teleport_confirm.teleport_id = packet.teleport_id
+                self.write_packet(teleport_confirm)
+            else:
+                position_response = serverbound.play.PositionAndLookPacket()
+                position_response.x = packet.x
+                position_response.feet_y = packet.y
+                position_response.z = packet.z
+                position_response.yaw = packet.yaw
+                position_response.pitch = packet.pitch
+                position_response.on_ground = True
+                self.write_packet(position_response)
+
+    async def run(self):
+        """Read and dispatch packets until the connection is closed"""
+        try:
+            if not await self._login():
+                return
+            self.playing = True
+
+            packet_types = self._packet_types(
+                clientbound.play,
+                extra=(
+                    clientbound.play.KeepAlivePacket,
+                    clientbound.play.PlayerPositionAndLookPacket,
+                ),
+            )
+            while not self.closed:
+                packet = await self._read_packet(packet_types)
+                if packet is not None:
+                    self._respond(packet)
+                    self._dispatch(packet)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self.closed:
+                # We closed the connection ourselves
+                return
+            if self.handle_exception is None:
+                raise
+            self.handle_exception(e, sys.exc_info())
+
+
+async def check_for_sleep(timeout, state):
+    """Asyncio version of `autofish.session.check_for_sleep`"""
+    wakeup = state.wakeup
+
+    await wakeup.wait_for(
+        lambda: state.recently_cast
+        or state.sleep_requested
+        or state.stop_requested
+        or not state.connected,
+        timeout,
+    )
+
+    if state.sleep_requested and not state.stop_requested:
+        # Stay logged off until the sleep-request is fulfilled
+        loop = asyncio.get_running_loop()
+        offline_start = loop.time()
+        sleep_time = state.options["sleep_time"]
+        await wakeup.wait_for(lambda: state.stop_requested, sleep_time)
+        state.time_offline += loop.time() - offline_start
+
+        # Hack to prevent the client from thinking the rod timed out when
+        # we were logged off
+        state.set_flags(sleep_requested=False, recently_cast=True)
+        return True
+
+    return False
+
+
+async def wait_or_stop(seconds, state):
+    """Asyncio version of `autofish.session.wait_or_stop`"""
+    if await state.wakeup.wait_for(lambda: state.stop_requested, seconds):
+        raise EndFishingSession
+
+
+async def fish(host, username, state):
+    """
+    Asyncio version of `autofish.session.fish`
+
+    Raises EndFishingSession when the session should end.
+    Raises RuntimeError if the host could not be resolved, or connecting failed
+    with an error that is not expected to go away by retrying.
+    """
+    if not host["offline"]:
+        raise RuntimeError("The asyncio engine only supports servers in offline mode")
+
+    # The condition variable used by the threaded engine would block the event loop
+    state.wakeup = AsyncWakeup()
+    backoff = Backoff(maximum=host["reconnect_delay_max"])
+    loop = asyncio.get_running_loop()
+    connected_at = None
+    slept = False
+
+    while True:
+        if state.connection is not None and not slept:
+            state.increment("reconnects")
+
+            if (
+                connected_at is not None
+                and loop.time() - connected_at > host["reconnect_delay_max"]
+            ):
+                # The last connection was healthy, so start over with short delays
+                backoff.reset()
+
+            delay = backoff.next_delay()
+            state.log.info("Reconnecting in %.1f seconds", delay)
+            log_event(state, RECONNECT, delay)
+            await wait_or_stop(delay, state)
+        slept = False
+
+        address, port = get_host_address(host, None)
+
+        # Limit the rate of connections to each host across all sessions
+        bucket = host_bucket(
+            f"{address}:{port}", host["connect_rate"], host["connect_burst"]
+        )
+        await wait_or_stop(bucket.reserve(), state)
+
+        connected_at = None
+        connection = AsyncConnection(
+            address,
+            port,
+            version=host["version"],
+            username=username,
+            handle_exception=partial(handle_exception, state=state),
+            counters=state,
+            recording=state.recording,
+        )
+        register_listeners(connection, state)
+        state.connection = connection
+
+        state.log.info("Connecting to %s:%s", address, port)
+        try:
+            await connection.connect()
+        except TRANSIENT_ERRORS as e:
+            # Likely restarting - retry like a dropped connection
+            state.log.warning("Could not connect: %s", e)
+            continue
+        except OSError as e:
+            raise RuntimeError(e)
+
+        connected_at = loop.time()
+        state.set_flags(connected=True)
+        reader = asyncio.ensure_future(connection.run())
+
+        try:
+            while state.connected:
+                # Check for timeouts, fishing is handled by eventlisteners
+                state.set_flags(recently_cast=False)
+                # Reconnect right away after logging off for a sleep-request
+                slept = await check_for_sleep(update_fish_timeout(state), state)
+                handle_wait_result(state)
+        finally:
+            connection.disconnect()
+            reader.cancel()
+
+
+async def _run_session(name, session, state):
+    try:
+        await fish(session["host"], session["username"], state)
+    except EndFishingSession:
+        pass
+    except RuntimeError as e:
+        state.log.error("Session failed: %s", e)
+    finally:
+        end_session(state)
+
+
+async def _run_sessions(sessions):
+    await asyncio.gather(
+        *(_run_session(name, session, state) for name, session, state in sessions)
+    )
+
+
+def run_sessions(sessions):
+    """
+    Run every session in `sessions` on one event loop
+
+    `sessions` is a list of tuples (name, session, state).
+    Blocks until every session has ended, or until interrupted with Ctrl+C.
+    """
+    try:
+        asyncio.run(_run_sessions(sessions))
+    except KeyboardInterrupt:
+        logger.info("Ending sessions")
@@ -0,0 +1,82 @@
+"""
+Retry delays and rate limiting for reconnects and repeated requests.
+
+Spreading out retries keeps a fleet of clients from reconnecting to a restarted
+server all at once.
+"""
+
+import random
+import threading
+from time import monotonic, sleep
+
+# Errors connecting to a server that are expected to go away by themselves, like
+# the server refusing connections while it restarts
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter
+
+    The n-th delay is drawn uniformly from [d/2, d] where d = base * factor^n,
+    capped at `maximum`.
+    """
+
+    def __init__(self, base=1, maximum=60, factor=2):
+        self.base = base
+        self.maximum = maximum
+        self.factor = factor
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.maximum, self.base * self.factor**self.attempts)
+        self.attempts += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempts = 0
+
+    def sleep(self):
+        sleep(self.next_delay())
+
+
+class TokenBucket:
+    """Rate limiter allowing `rate` events per second, in bursts of `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, and return the number of seconds to wait before using it"""
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+            # Go into debt, so that later callers wait behind us
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def host_bucket(host, rate, capacity=1):
+    """
+    Return the token bucket shared by every connection to `host`
+
+    The bucket is created with the given rate and capacity on first use.
+    """
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(rate, capacity)
+        return _buckets[host]
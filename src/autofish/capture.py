@@ -0,0 +1,249 @@
+"""
+Capture of the packets a session receives, and replay of captures.
+
+With `--record`, every clientbound packet is written to a capture file with the
+time it arrived, exactly as read from the connection after decryption and
+decompression. Both engines record at the reader, so unknown packets and fields
+pyCraft does not decode are kept, and each frame is tagged with the state the
+connection was in when it was read. `replay` feeds a capture back through the
+event listeners in `autofish.fishing` without a network, at the recorded pace or
+as fast as possible, to debug a misbehaving session offline.
+
+A capture starts with `MAGIC` and the minecraft version, followed by one frame per
+packet: a `FRAME` header and the uncompressed packet (id and fields).
+"""
+
+import os
+import struct
+import zlib
+from time import perf_counter, sleep, time
+
+from minecraft import SUPPORTED_MINECRAFT_VERSIONS
+from minecraft.networking.connection import ConnectionContext
+from minecraft.networking.packets import Packet, PacketBuffer, clientbound
+from minecraft.networking.types import VarInt
+
+from autofish.fishing import FishingConnection, register_listeners
+
+MAGIC = b"AFCAPT01"
+
+# Length of the version string
+VERSION_LENGTH = struct.Struct("<B")
+
+# Unix time, connection state, length of the packet
+FRAME = struct.Struct("<dBI")
+
+# Connection states
+LOGIN = 0
+PLAY = 1
+
+
+def create_context(version):
+    return ConnectionContext(protocol_version=SUPPORTED_MINECRAFT_VERSIONS[version])
+
+
+class Recording:
+    """
+    Capture file opened for writing
+
+    The file is unbuffered, so every frame reaches the OS in a single write.
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+
+        self._file = open(path, "wb", buffering=0)
+        encoded_version = version.encode("utf-8")
+        self._file.write(
+            MAGIC + VERSION_LENGTH.pack(len(encoded_version)) + encoded_version
+        )
+
+    def write(self, state, data):
+        self._file.write(FRAME.pack(time(), state, len(data)) + data)
+
+    def close(self):
+        self._file.close()
+
+
+def open_recording(path, version):
+    """Return a Recording writing to `path`. Raises RuntimeError on failure"""
+    try:
+        return Recording(path, version)
+    except OSError as e:
+        raise RuntimeError(f"Could not open the capture file {path}: {e}")
+
+
+def session_record_path(path, name):
+    """Return the capture file of the session `name` when recording several"""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{name}{ext}"
+
+
+def encode_packet(packet):
+    """
+    Return the uncompressed id and fields of a decoded packet
+
+    Used to build captures from packets made up by hand.
+    """
+    buffer = PacketBuffer()
+    VarInt.send(packet.id, buffer)
+    # pyCraft only keeps the id of packets it has no definition for
+    if type(packet) is not Packet:
+        packet.write_fields(buffer)
+    return buffer.get_writable()
+
+
+def _frame_packet(data, compressed):
+    """Return the uncompressed packet from the length prefixed frame `data`"""
+    buffer = PacketBuffer()
+    buffer.send(bytes(data))
+    buffer.reset_cursor()
+
+    # Skip the frame length
+    VarInt.read(buffer)
+    if compressed and VarInt.read(buffer) > 0:
+        return zlib.decompress(buffer.read())
+    return buffer.read()
+
+
+class RecordingConnection(FishingConnection):
+    """
+    pyCraft connection writing every frame it reads to `recording`
+
+    pyCraft only hands decoded packets to listeners, so the frames are taken from
+    the stream the login and play reactors read from. This is after decryption, as
+    the reactors read from the decrypting stream.
+    """
+
+    keep_frames = True
+
+    def __init__(self, *args, recording, **kwargs):
+        self.recording = recording
+        super().__init__(*args, **kwargs)
+
+    def _frame_read(self, packet, playing, stream, compressed):
+        super()._frame_read(packet, playing, stream, compressed)
+        self.recording.write(
+            PLAY if playing else LOGIN, _frame_packet(stream.data, compressed)
+        )
+
+
+def read_recording(path):
+    """
+    Return a tuple (version, frames) from the capture at `path`
+
+    `frames` is a list of (time, state, data) tuples. A partially written frame
+    at the end of the capture is ignored.
+    Raises ValueError if the file is not a capture.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an autofish capture")
+
+    offset = len(MAGIC)
+    (version_length,) = VERSION_LENGTH.unpack_from(data, offset)
+    offset += VERSION_LENGTH.size
+    version = data[offset : offset + version_length].decode("utf-8")
+    offset += version_length
+
+    frames = []
+    view = memoryview(data)
+    while offset + FRAME.size <= len(data):
+        timestamp, state, length = FRAME.unpack_from(data, offset)
+        start = offset + FRAME.size
+        if start + length > len(data):
+            break
+        frames.append((timestamp, state, bytes(view[start : start + length])))
+        offset = start + length
+
+    return version, frames
+
+
+def read_packet_id(data):
+    """Return the id of the uncompressed packet `data`"""
+    buffer = PacketBuffer()
+    # A VarInt is at most 5 bytes long
+    buffer.send(data[:5])
+    buffer.reset_cursor()
+    return VarInt.read(buffer)
+
+
+class ReplayConnection:
+    """
+    Stand-in for a connection, feeding captured packets to its listeners
+
+    Packets written by the listeners are kept in `packets_written`.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.listeners = {}
+        self.packets_written = []
+        self.closed = False
+
+    def register_packet_listener(self, method, *packet_types):
+        for packet_type in packet_types:
+            self.listeners.setdefault(packet_type, []).append(method)
+
+    def write_packet(self, packet):
+        self.packets_written.append(packet)
+
+    def disconnect(self, immediate=False):
+        self.closed = True
+
+    def packet_types(self, packets):
+        """Return a mapping id->packet for the packets in `packets` we listen to"""
+        return {
+            packet.get_id(self.context): packet
+            for packet in packets.get_packets(self.context)
+            if packet in self.listeners
+        }
+
+    def dispatch(self, packet_type, data):
+        """Decode `data` as a `packet_type` and call its listeners"""
+        buffer = PacketBuffer()
+        buffer.send(data)
+        buffer.reset_cursor()
+
+        # Skip the packet id
+        VarInt.read(buffer)
+
+        packet = packet_type(self.context)
+        packet.read(buffer)
+        for listener in self.listeners[packet_type]:
+            listener(packet)
+
+
+def replay(frames, state, context, realtime=False):
+    """
+    Feed `frames` through the event listeners of the session in `state`
+
+    The listeners are registered on a `ReplayConnection`, which is returned.
+    With `realtime` the packets are spaced as they were recorded, otherwise they
+    are replayed as fast as possible. Only the packets with a listener are decoded.
+    """
+    connection = ReplayConnection(context)
+    register_listeners(connection, state)
+    state.connection = connection
+    state.set_flags(connected=True)
+
+    packet_types = {
+        LOGIN: connection.packet_types(clientbound.login),
+        PLAY: connection.packet_types(clientbound.play),
+    }
+
+    replay_start = perf_counter()
+    for timestamp, connection_state, data in frames:
+        if realtime:
+            delay = timestamp - frames[0][0] - (perf_counter() - replay_start)
+            if delay > 0:
+                sleep(delay)
+
+        packet_type = packet_types[connection_state].get(read_packet_id(data))
+        if packet_type is not None:
+            connection.dispatch(packet_type, data)
+
+    return connection
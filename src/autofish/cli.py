@@ -0,0 +1,351 @@
+import sys
+from argparse import ArgumentParser, FileType
+from time import perf_counter
+
+from autofish import importprofile
+from autofish.config import read_config
+from autofish.eventlog import aggregate, print_stats
+from autofish.gamedata import (
+    get_bobber_splash_id,
+    import_bundle,
+    lookup_sound_id,
+    prefetch_sound_ids,
+    read_cache_file,
+    write_cache_file,
+)
+from autofish.log import (
+    FORMATTERS,
+    LEVELS,
+    host_name,
+    logger,
+    session_logger,
+    setup_logging,
+    stop_logging,
+)
+from autofish.versions import is_supported, versions_between
+
+
+def get_options():
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "-c",
+        "--config",
+        help="Path to the .toml config-file",
+        default="config.toml",
+    )
+
+    parser.add_argument(
+        "-g",
+        "--gamedata",
+        help="Path to the .json gamedata cachefile",
+        type=FileType("a+", encoding="UTF-8"),
+        default="gamedata.json",
+    )
+
+    parser.add_argument(
+        "-e",
+        "--engine",
+        help=(
+            "Networking engine. 'asyncio' runs all sessions on one thread, "
+            "but only supports servers in offline mode"
+        ),
+        choices=("threaded", "asyncio"),
+        default="threaded",
+    )
+
+    parser.add_argument(
+        "--timings",
+        help="Path to a .json file where latency histograms are written on exit",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        help="Serve live statistics in the Prometheus format on localhost:PORT",
+        type=int,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--log-level",
+        help="Only log messages at this level or above",
+        choices=LEVELS,
+        default="info",
+    )
+
+    parser.add_argument(
+        "--log-format",
+        help="Format of the log. 'json' and 'logfmt' write one record per line",
+        choices=tuple(FORMATTERS),
+        default="text",
+    )
+
+    parser.add_argument(
+        "--record",
+        help="Capture every packet received to this file, see the replay command",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--startup-profile",
+        help="Print how long importing each package took",
+        action="store_true",
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+
+    prefetch_parser = subparsers.add_parser(
+        "prefetch",
+        help="Fill the gamedata cachefile with sound ids for many versions",
+        description=(
+            "Resolve sound ids for the given versions and store them in the "
+            "gamedata cachefile. Without any versions, every supported version "
+            "is resolved."
+        ),
+    )
+    prefetch_parser.add_argument("versions", nargs="*", help="Versions to resolve")
+    prefetch_parser.add_argument(
+        "--from", dest="from_version", help="Resolve every version from this one"
+    )
+    prefetch_parser.add_argument(
+        "--to", dest="to_version", help="Resolve every version up to this one"
+    )
+    prefetch_parser.add_argument(
+        "--workers", help="Number of concurrent downloads", type=int, default=8
+    )
+    prefetch_parser.add_argument(
+        "--import",
+        dest="imports",
+        help="Read sound ids from local Burger dumps or exported bundles",
+        nargs="+",
+        default=[],
+    )
+    prefetch_parser.add_argument(
+        "--export", help="Also write the resulting cache to this bundle file"
+    )
+    prefetch_parser.add_argument(
+        "--offline",
+        help="Only import local files, don't download anything",
+        action="store_true",
+    )
+
+    stats_parser = subparsers.add_parser(
+        "stats",
+        help="Aggregate the statistics in event logs",
+        description="Print statistics over every session in the given event logs.",
+    )
+    stats_parser.add_argument("logs", nargs="+", help="Event logs to aggregate")
+    stats_parser.add_argument(
+        "--daily", help="Also print the fish caught each day", action="store_true"
+    )
+
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="Feed a capture made with --record through the event listeners",
+        description=(
+            "Replay the packets in a capture through the event listeners, without "
+            "connecting to a server, using the options in the config."
+        ),
+    )
+    replay_parser.add_argument("capture", help="Capture file to replay")
+    replay_parser.add_argument(
+        "--realtime",
+        help="Space the packets as they were received instead of replaying at once",
+        action="store_true",
+    )
+
+    return parser.parse_args()
+
+
+def prefetch(options):
+    """Fill the gamedata cache as requested by the prefetch subcommand"""
+    cache_path = options.gamedata.name
+    options.gamedata.close()
+    cache = read_cache_file(cache_path)
+
+    for path in options.imports:
+        try:
+            cache.update(import_bundle(path))
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Could not import {path}: {e}")
+            sys.exit(1)
+
+    bounds = [v for v in (options.from_version, options.to_version) if v is not None]
+    for version in options.versions + bounds:
+        if not is_supported(version):
+            print(f"Version {version} not supported")
+            sys.exit(1)
+
+    versions = list(options.versions)
+    if bounds or not versions:
+        versions.extend(versions_between(options.from_version, options.to_version))
+
+    missing = [
+        version
+        for version in dict.fromkeys(versions)
+        if version not in cache and lookup_sound_id(version) is None
+    ]
+
+    if missing and not options.offline:
+        print(f"Downloading sound ids for {len(missing)} versions")
+        sound_ids, errors = prefetch_sound_ids(missing, workers=options.workers)
+        cache.update(sound_ids)
+        for version, error in errors.items():
+            print(f"{version}: {error}")
+    elif missing:
+        print(f"Sound ids for {len(missing)} versions are still missing")
+
+    write_cache_file(cache, cache_path)
+    print(f"Wrote {len(cache)} sound ids to {cache_path}")
+
+    if options.export is not None:
+        write_cache_file(cache, options.export)
+        print(f"Exported the cache to {options.export}")
+
+
+def replay_capture(options, config):
+    """Replay a capture as requested by the replay subcommand"""
+    from autofish.capture import create_context, read_recording, replay
+    from autofish.session import create_state
+
+    try:
+        version, frames = read_recording(options.capture)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    splash_id = get_bobber_splash_id(version, fp=options.gamedata)
+
+    # Keep the replayed catches out of the event log
+    state = create_state(
+        {**config["options"], "event_log_path": ""},
+        splash_id,
+        log=session_logger("replay"),
+    )
+
+    start = perf_counter()
+    connection = replay(
+        frames, state, create_context(version), realtime=options.realtime
+    )
+    elapsed = perf_counter() - start
+
+    stop_logging()
+    print(
+        f"Replayed {len(frames)} packets from {version} in {elapsed:.3f} seconds "
+        f"({len(frames) / max(elapsed, 1e-9):.0f} packets/s)"
+    )
+    print(
+        f"Caught {state.amount_caught} fish, "
+        f"sent {len(connection.packets_written)} packets"
+    )
+
+
+def main():
+    # --startup-profile is handled in __main__, before importing this module
+    options = get_options()
+
+    setup_logging(level=options.log_level, fmt=options.log_format)
+
+    if options.command == "prefetch":
+        prefetch(options)
+        sys.exit()
+
+    if options.command == "stats":
+        options.gamedata.close()
+        try:
+            stats = aggregate(options.logs)
+        except (OSError, ValueError) as e:
+            print(e)
+            sys.exit(1)
+        print_stats(stats, daily=options.daily)
+        sys.exit()
+
+    # Imported here, as the prefetch and stats commands need neither pyCraft's
+    # networking nor requests
+    from autofish.session import (
+        EndFishingSession,
+        create_state,
+        end_session,
+        fish,
+        print_summary,
+    )
+    from autofish.startup import format_timings, start_session
+    from autofish.supervisor import supervise
+    from autofish.timing import export_timings
+
+    try:
+        CONFIG = read_config(path=options.config)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    if options.command == "replay":
+        replay_capture(options, CONFIG)
+        sys.exit()
+
+    if "sessions" in CONFIG or options.engine == "asyncio":
+        # Run every configured session from this process
+        options.gamedata.close()
+        sessions = CONFIG.get(
+            "sessions", [{"options": CONFIG["options"], "host": CONFIG["host"]}]
+        )
+        try:
+            supervise(
+                sessions,
+                options.gamedata.name,
+                engine=options.engine,
+                timings_path=options.timings,
+                metrics_port=options.metrics_port,
+                record_path=options.record,
+            )
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        sys.exit()
+
+    OPTIONS = CONFIG["options"]
+    HOST = CONFIG["host"]
+
+    try:
+        splash_id, auth_token, username, address, timings = start_session(
+            HOST, OPTIONS, options.gamedata
+        )
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    logger.info("Startup: %s", format_timings(timings))
+    importprofile.report()
+
+    # Program state
+    try:
+        state = create_state(
+            OPTIONS, splash_id, log=session_logger(username, host_name(HOST))
+        )
+        if options.record is not None:
+            from autofish.capture import open_recording
+
+            state.recording = open_recording(options.record, HOST["version"])
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    if options.metrics_port is not None:
+        from autofish.metrics import start_metrics_server
+
+        start_metrics_server([(username, state)], options.metrics_port)
+
+    try:
+        fish(HOST, auth_token, username, state, resolved_address=address)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    except (KeyboardInterrupt, EndFishingSession):
+        state.log.info("Ending session")
+        end_session(state)
+        stop_logging()
+        print_summary(state)
+        if options.timings is not None:
+            export_timings({username: state}, options.timings)
+        sys.exit()
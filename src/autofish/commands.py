@@ -0,0 +1,159 @@
+"""
+Chat commands other players can send to a fishing session.
+
+Chat can be constant on busy servers, so every chat packet is first checked for a
+plain substring of one of the commands in its raw json. Only packets that pass are
+decoded. Commands are then checked against the allow-list and a per-player
+cooldown before being handed to the handlers in `autofish.fishing`.
+"""
+
+import json
+import re
+from time import monotonic
+
+from minecraft.networking.packets import clientbound
+
+# Names of the commands, each triggered by the message in the option
+# `<name>_command`
+COMMANDS = ("sleep", "status", "pause", "resume")
+
+# Forget the last command of players when tracking more than this many
+MAX_TRACKED_PLAYERS = 1000
+
+Position = clientbound.play.ChatMessagePacket.Position
+
+# Characters some json encoders escape and others don't. The server escapes the
+# html characters by default
+UNSAFE_CHARACTERS = frozenset("\"\\<>&='")
+
+# System messages that carry a message from another player
+WHISPERS = ("commands.message.display.incoming", "chat.type.announcement")
+
+
+def command_messages(options):
+    """Return a dict mapping the message of each enabled command to its name"""
+    messages = {}
+    if options["sleep_helper"] and options["sleep_command"]:
+        messages[options["sleep_command"]] = "sleep"
+
+    for name in COMMANDS[1:]:
+        message = options[f"{name}_command"]
+        if message and message not in messages:
+            messages[message] = name
+
+    return messages
+
+
+def _needles(message):
+    """
+    Return the forms the longest part of `message` may take in the raw json
+
+    `message` is split at characters json encoders disagree on escaping. Other
+    characters outside of ascii are either kept as is or escaped as \\uXXXX, with
+    lower or upper case hex digits. Returns an empty set if no part is left.
+    """
+    longest = ""
+    current = ""
+    for char in message:
+        if char in UNSAFE_CHARACTERS or char < " ":
+            current = ""
+        else:
+            current += char
+            longest = max(longest, current, key=len)
+
+    if not longest:
+        return set()
+
+    escaped = json.dumps(longest)[1:-1]
+    upper = re.sub(
+        r"\\u([0-9a-f]{4})", lambda match: "\\u" + match.group(1).upper(), escaped
+    )
+    return {longest, escaped, upper}
+
+
+def parse_chat(json_data, position):
+    """
+    Return a tuple (sender, message) for a chat message from another player
+
+    Returns None for other messages, like server announcements of joins.
+    """
+    try:
+        data = json.loads(json_data)
+        if position == Position.SYSTEM and data.get("translate", "") in WHISPERS:
+            # Whispers and such
+            sender, message = data["with"][0]["text"], data["with"][1]["text"]
+        elif position == Position.CHAT:
+            # Chat message
+            sender, message = data["with"][0]["insertion"], data["with"][1]
+        else:
+            return None
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+    if not isinstance(sender, str) or not isinstance(message, str):
+        return None
+    return sender, message
+
+
+class ChatCommands:
+    """
+    The chat commands of one session
+
+    `match` is cheap enough to run on every chat packet, and `lookup` applies the
+    allow-list and the per-player cooldown.
+    """
+
+    def __init__(self, options):
+        self.messages = command_messages(options)
+        self.allowlist = {name.casefold() for name in options["command_allowlist"]}
+        self.cooldown = options["command_cooldown"]
+        self.last_used = {}
+
+        needles = [_needles(message) for message in self.messages]
+        # Commands without a usable needle have to be decoded every time
+        if all(needles):
+            self.needles = tuple(set().union(*needles))
+        else:
+            self.needles = None
+
+    def __bool__(self):
+        return bool(self.messages)
+
+    def match(self, json_data):
+        """Return False if `json_data` can't contain any of the commands"""
+        if self.needles is None:
+            return bool(self.messages)
+        for needle in self.needles:
+            if needle in json_data:
+                return True
+        return False
+
+    def lookup(self, sender, message, now=None):
+        """
+        Return the name of the command `sender` sent with `message`
+
+        Returns None if `message` is no command, or `sender` is not allowed to
+        use it right now.
+        """
+        name = self.messages.get(message)
+        if name is None:
+            return None
+
+        player = sender.casefold()
+        if self.allowlist and player not in self.allowlist:
+            return None
+
+        now = monotonic() if now is None else now
+        last_used = self.last_used.get(player)
+        if last_used is not None and now - last_used < self.cooldown:
+            return None
+
+        if len(self.last_used) >= MAX_TRACKED_PLAYERS:
+            self.last_used = {
+                other: time
+                for other, time in self.last_used.items()
+                if now - time < self.cooldown
+            }
+        self.last_used[player] = now
+
+        return name
@@ -1,5 +1,3 @@
-import toml
-
 from autofish.versions import LATEST_RELEASE_VERSION
 
 DEFAULT_OPTIONS = {
@@ -10,8 +8,18 @@ DEFAULT_OPTIONS = {
     "sleep_command": "sleep",
     "sleep_time": 10,
     "sleep_helper": True,
+    "status_command": "",
+    "pause_command": "",
+    "resume_command": "",
+    "command_allowlist": [],
+    "command_cooldown": 5,
     "fish_timeout": 60,
+    "adaptive_timeout": False,
+    "fish_timeout_min": 15,
+    "timeout_percentile": 95,
     "durability_threshold": 30,
+    "token_trust_window": 3600,
+    "event_log_path": "",
 }
 
 DEFAULT_HOST = {
@@ -19,6 +27,10 @@ DEFAULT_HOST = {
     "port": "25565",
     "version": LATEST_RELEASE_VERSION,
     "offline": False,
+    "realm_cache_ttl": 3600,
+    "reconnect_delay_max": 60,
+    "connect_rate": 0.5,
+    "connect_burst": 2,
 }
 
 
@@ -28,6 +40,8 @@ def read_config(path=None, fp=None):
 
     Raises RuntimeError if any exceptions are caught
     """
+    import toml
+
     if path is not None:
         try:
             with open(path, "r") as f:
@@ -50,19 +64,58 @@ def read_config(path=None, fp=None):
         elif type(config[key]) is not dict:
             raise RuntimeError(f"Key '{key}' in config must be a dict")
 
+    if "sessions" in config:
+        if type(config["sessions"]) is not list:
+            raise RuntimeError("Key 'sessions' in config must be an array of tables")
+
+        # Every session inherits the top level options and host
+        sessions = []
+        for i, session in enumerate(config["sessions"]):
+            if type(session) is not dict:
+                raise RuntimeError(f"Session {i} in config must be a table")
+
+            for key in ("options", "host"):
+                if type(session.get(key, {})) is not dict:
+                    raise RuntimeError(f"Key '{key}' in session {i} must be a dict")
+
+            sessions.append(
+                {
+                    "options": _populate_options(
+                        {**config["options"], **session.get("options", {})}
+                    ),
+                    "host": _populate_host(
+                        {**config["host"], **session.get("host", {})}
+                    ),
+                }
+            )
+
+        config["sessions"] = sessions
+
+    config["options"] = _populate_options(config["options"])
+    config["host"] = _populate_host(config["host"])
+
+    return config
+
+
+def _populate_options(options):
+    """Insert default values for missing keys in `options`"""
     # Populate options with default values
     for key in DEFAULT_OPTIONS:
-        config["options"][key] = config["options"].get(key, DEFAULT_OPTIONS[key])
+        options[key] = options.get(key, DEFAULT_OPTIONS[key])
 
     # Extra handling for sleep_time and sleep_message
-    config["options"]["sleep_time"] = int(config["options"]["sleep_time"])
-    config["options"]["sleep_message"] = config["options"]["sleep_message"].format(
-        sleep_time=config["options"]["sleep_time"],
-        sleep_command=config["options"]["sleep_command"],
+    options["sleep_time"] = int(options["sleep_time"])
+    options["sleep_message"] = options["sleep_message"].format(
+        sleep_time=options["sleep_time"],
+        sleep_command=options["sleep_command"],
     )
 
-    # Populate host with default values
+    return options
+
+
+def _populate_host(host):
+    """Insert default values for missing keys in `host`"""
     for key in DEFAULT_HOST:
-        config["host"][key] = config["host"].get(key, DEFAULT_HOST[key])
+        host[key] = host.get(key, DEFAULT_HOST[key])
 
-    return config
+    return host
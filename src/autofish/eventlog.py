@@ -0,0 +1,168 @@
+"""
+Append-only log of session events, kept across runs.
+
+Every catch, timeout, reconnect and sleep-request is written as a fixed size
+binary record as soon as it happens, so the log survives the process being
+killed. `read_events` and `aggregate` turn many logs into long-term statistics.
+"""
+
+import struct
+from datetime import date
+from time import time
+
+MAGIC = b"AFEVLOG1"
+
+# Unix time, event kind, value
+RECORD = struct.Struct("<dBf")
+
+START = 0
+CATCH = 1
+TIMEOUT = 2
+RECONNECT = 3
+SLEEP = 4
+END = 5
+
+EVENT_NAMES = {
+    START: "start",
+    CATCH: "catch",
+    TIMEOUT: "timeout",
+    RECONNECT: "reconnect",
+    SLEEP: "sleep",
+    END: "end",
+}
+
+
+class EventLog:
+    """
+    Event log opened for appending
+
+    The file is unbuffered, so every record reaches the OS in a single write.
+    A record torn by the process being killed mid-write is cut off when opening,
+    as it would misalign every record written after it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab", buffering=0)
+
+        size = self._file.tell()
+        with open(path, "rb") as f:
+            head = f.read(len(MAGIC))
+
+        if size < len(MAGIC) and MAGIC.startswith(head):
+            # New log, or one killed while writing the magic
+            self._file.truncate(0)
+            self._file.write(MAGIC)
+        elif head != MAGIC:
+            self._file.close()
+            raise RuntimeError(f"{path} is not an autofish event log")
+        else:
+            torn = (size - len(MAGIC)) % RECORD.size
+            if torn:
+                self._file.truncate(size - torn)
+
+    def write(self, kind, value=0.0):
+        self._file.write(RECORD.pack(time(), kind, value))
+
+    def close(self):
+        self._file.close()
+
+
+def open_event_log(path):
+    """Return an EventLog appending to `path`, or None if `path` is empty"""
+    if not path:
+        return None
+
+    try:
+        return EventLog(path)
+    except OSError as e:
+        raise RuntimeError(f"Could not open the event log {path}: {e}")
+
+
+def log_event(state, kind, value=0.0):
+    """Record an event for the session in `state`, if it has an event log"""
+    if state.event_log is not None:
+        state.event_log.write(kind, value)
+
+
+def read_events(path):
+    """
+    Return a list of (time, kind, value) tuples from the event log at `path`
+
+    A partially written record at the end of the log is ignored.
+    Raises ValueError if the file is not an event log.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an autofish event log")
+
+    end = len(MAGIC) + (len(data) - len(MAGIC)) // RECORD.size * RECORD.size
+    return list(RECORD.iter_unpack(memoryview(data)[len(MAGIC) : end]))
+
+
+def aggregate(paths):
+    """
+    Return statistics over every session in the event logs at `paths`
+
+    Sessions that were killed without logging their end are assumed to have
+    ended at their last event.
+    The result is a dict of totals, with `days` mapping each local date
+    (YYYY-MM-DD) to the number of catches that day.
+    """
+    counts = dict.fromkeys(EVENT_NAMES, 0)
+    seconds = 0.0
+    days = {}
+
+    for path in paths:
+        session_start = None
+        last_time = None
+
+        for timestamp, kind, _ in read_events(path):
+            if kind == START:
+                if session_start is not None:
+                    seconds += last_time - session_start
+                session_start = timestamp
+            elif kind == CATCH:
+                day = date.fromtimestamp(timestamp).isoformat()
+                days[day] = days.get(day, 0) + 1
+            elif kind == END and session_start is not None:
+                seconds += timestamp - session_start
+                session_start = None
+
+            if kind in counts:
+                counts[kind] += 1
+            last_time = timestamp
+
+        if session_start is not None:
+            seconds += last_time - session_start
+
+    return {
+        "sessions": counts[START],
+        "seconds": seconds,
+        "catches": counts[CATCH],
+        "timeouts": counts[TIMEOUT],
+        "reconnects": counts[RECONNECT],
+        "sleep_requests": counts[SLEEP],
+        "days": dict(sorted(days.items())),
+    }
+
+
+def print_stats(stats, daily=False):
+    """Print statistics returned by `aggregate`"""
+    hours = stats["seconds"] / 3600
+
+    print(f"Sessions: {stats['sessions']}")
+    print(f"Time fishing: {hours:.1f}h")
+    print(f"Fish caught: {stats['catches']}")
+    if hours > 0:
+        print(f"Fish/hour: {stats['catches'] / hours:.1f}")
+    print(f"Timeouts: {stats['timeouts']}")
+    print(f"Reconnects: {stats['reconnects']}")
+    print(f"Sleep-requests: {stats['sleep_requests']}")
+
+    if daily:
+        print("Fish caught per day:")
+        for day, catches in stats["days"].items():
+            print(f"\t{day}: {catches}")
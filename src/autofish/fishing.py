@@ -1,114 +1,177 @@
-import json
+from datetime import datetime, timedelta
 from functools import partial
+from time import perf_counter
 
-from minecraft.networking.connection import Connection
-from minecraft.networking.packets import clientbound, serverbound
+from minecraft.exceptions import YggdrasilError
+from minecraft.networking.connection import Connection, LoginReactor, PlayingReactor
+from minecraft.networking.packets import Packet, clientbound, serverbound
 
-from autofish.utils import print_timestamped
+from autofish.commands import parse_chat
+from autofish.eventlog import CATCH, SLEEP, log_event
+
+# Packets pyCraft's play reactor answers or acts on itself
+REACTOR_PACKETS = (
+    clientbound.play.KeepAlivePacket,
+    clientbound.play.PlayerPositionAndLookPacket,
+    clientbound.play.DisconnectPacket,
+    clientbound.play.SetCompressionPacket,
+    clientbound.play.JoinGamePacket,
+    clientbound.play.RespawnPacket,
+)
 
 
 def use_item(state):
     """Send a `UseItemPacket` to `connection`"""
     packet = serverbound.play.UseItemPacket()
     packet.hand = packet.Hand.MAIN
-    state["connection"].write_packet(packet)
+    state.connection.write_packet(packet)
+    state.last_use = perf_counter()
+
+
+def send_chat(state, message):
+    """Send `message` in the chat"""
+    packet = serverbound.play.ChatPacket()
+    packet.message = message
+    state.connection.write_packet(packet)
 
 
 def handle_join_game(pak, state):
-    print_timestamped("Connection established")
+    state.log.info("Connection established")
 
     # Cast the rod
-    use_item(state)
+    if not state.paused:
+        use_item(state)
 
     # Greet the server
-    if state["greet_message"] != "" and state["greet_message"] is not None:
-        greet_packet = serverbound.play.ChatPacket()
-        greet_packet.message = state["greet_message"]
-        state["connection"].write_packet(greet_packet)
+    greet_message = state.options["greet_message"]
+    if greet_message != "" and greet_message is not None:
+        send_chat(state, greet_message)
 
     # Inform the server of the sleep command
-    if state["sleep_helper"]:
-        sleep_packet = serverbound.play.ChatPacket()
-        sleep_packet.message = state["sleep_message"]
-        state["connection"].write_packet(sleep_packet)
+    if state.options["sleep_helper"]:
+        send_chat(state, state.options["sleep_message"])
 
 
 def handle_sound_play(pak, state):
-    if pak.sound_id != state["bobber_splash_id"]:
+    if pak.sound_id != state.bobber_splash_id or state.paused:
         return
 
+    arrival = perf_counter()
+    bite = 0.0
+    if state.last_use is not None:
+        bite = arrival - state.last_use
+        state.timings["bite"].record(bite)
+
     # Reel in and cast
     use_item(state)
+    state.timings["reaction"].record(state.last_use - arrival)
     use_item(state)
 
-    state["recently_cast"] = True
-    state["amount_caught"] += 1
+    state.increment("amount_caught")
+    state.set_flags(recently_cast=True)
+    log_event(state, CATCH, bite)
 
-    if state["print_output"]:
-        print_timestamped("Caught one!")
+    if state.options["print_output"]:
+        state.log.info("Caught one!")
 
 
 def handle_dc(pak, state):
-    print_timestamped("DC-packet recieved, id: " + str(pak.id))
+    state.log.warning("DC-packet recieved, id: %s", pak.id)
 
     # Disconnected from server - restart connection
-    state["connection"].disconnect(immediate=True)
-    state["connected"] = False
+    state.connection.disconnect(immediate=True)
+    state.set_flags(connected=False)
 
 
 def handle_chat(pak, state):
-    data = json.loads(pak.json_data)
-
-    if pak.position == clientbound.play.ChatMessagePacket.Position.SYSTEM and (
-        data.get("translate", "") == "commands.message.display.incoming"
-        or data.get("translate", "") == "chat.type.announcement"
-    ):
-        # Whispers and such
-        name = data["with"][0]["text"]
-        message = data["with"][1]["text"]
-    elif pak.position == clientbound.play.ChatMessagePacket.Position.CHAT:
-        # Chat message
-        name = data["with"][0]["insertion"]
-        message = data["with"][1]
-    else:
+    # Most chat is not meant for us, so avoid decoding it
+    if not state.commands.match(pak.json_data):
+        return
+
+    chat = parse_chat(pak.json_data, pak.position)
+    if chat is None:
         return
 
-    if message != state["sleep_command"]:
+    name, message = chat
+    command = state.commands.lookup(name, message)
+    if command is None:
         return
 
-    print_timestamped("Sleep requested by " + name)
+    COMMAND_HANDLERS[command](state, name)
+
+
+def handle_sleep_command(state, name):
+    state.log.info("Sleep requested by %s", name)
+
+    state.increment("sleep_requests")
+    log_event(state, SLEEP, state.options["sleep_time"])
+
+    # Disconnect, and notify main loop that sleep has been requested
+    state.connection.disconnect(immediate=True)
+    state.set_flags(sleep_requested=True, connected=False)
+
+
+def handle_status_command(state, name):
+    elapsed = datetime.now() - state.start_time
+    # Leave out the microseconds
+    elapsed = timedelta(seconds=int(elapsed.total_seconds()))
+    activity = "Paused" if state.paused else "Fishing"
+    send_chat(
+        state, f"{activity} for {elapsed}, caught {state.amount_caught} fish so far"
+    )
+
+
+def handle_pause_command(state, name):
+    if state.paused:
+        return
+
+    state.log.info("Paused by %s", name)
+
+    # Reel in
+    use_item(state)
+    state.set_flags(paused=True)
+
+
+def handle_resume_command(state, name):
+    if not state.paused:
+        return
+
+    state.log.info("Resumed by %s", name)
+
+    # Cast the rod, and restart the timeout
+    use_item(state)
+    state.set_flags(paused=False, recently_cast=True)
+
 
-    # Notify main loop that sleep has been requested
-    state["sleep_requested"] = True
+COMMAND_HANDLERS = {
+    "sleep": handle_sleep_command,
+    "status": handle_status_command,
+    "pause": handle_pause_command,
+    "resume": handle_resume_command,
+}
 
-    # Disconnected from server
-    state["connection"].disconnect(immediate=True)
-    state["connected"] = False
+
+def handle_packet(pak, state):
+    state.increment("packets_received")
 
 
 def handle_exception(exc, sysstat, state):
     """Handle exceptions in the connection"""
     if isinstance(exc, KeyboardInterrupt):
         return
-    print_timestamped("Exception handled: ", exc)
-    print_timestamped(sysstat)
+    state.log.error("Exception handled: %s", exc)
+    state.log.debug("Exception in the connection", exc_info=sysstat)
 
-    # Disconnected from server - restart connection
-    state["connection"].disconnect(immediate=True)
-    state["connected"] = False
+    # If the session join was rejected, validate the token before reconnecting
+    auth_failed = isinstance(exc, YggdrasilError)
 
+    # Disconnected from server - restart connection
+    state.connection.disconnect(immediate=True)
+    state.set_flags(connected=False, auth_failed=auth_failed or state.auth_failed)
 
-def setup_connection(address, port, version, auth_token, state, username=None):
-    connection = Connection(
-        address,
-        port,
-        auth_token=auth_token,
-        initial_version=version,
-        username=username,
-        handle_exception=partial(handle_exception, state=state),
-    )
-    print_timestamped(f"Connecting to {address}:{port}")
 
+def register_listeners(connection, state):
+    """Register the fishing event listeners for `state` on `connection`"""
     # Cast rod on join
     connection.register_packet_listener(
         partial(handle_join_game, state=state), clientbound.play.JoinGamePacket
@@ -119,8 +182,8 @@ def setup_connection(address, port, version, auth_token, state, username=None):
         partial(handle_sound_play, state=state), clientbound.play.SoundEffectPacket
     )
 
-    if state["sleep_helper"]:
-        # Disconnect for a while when people need to sleep
+    if state.commands:
+        # Respond to chat commands, like sleep-requests
         connection.register_packet_listener(
             partial(handle_chat, state=state), clientbound.play.ChatMessagePacket
         )
@@ -133,4 +196,111 @@ def setup_connection(address, port, version, auth_token, state, username=None):
         partial(handle_dc, state=state), clientbound.login.DisconnectPacket
     )
 
+
+class _CountingStream:
+    """Stream wrapper counting the bytes read from it, and keeping them if asked"""
+
+    def __init__(self, stream, keep=False):
+        self.stream = stream
+        self.length = 0
+        self.data = bytearray() if keep else None
+
+    def read(self, length):
+        data = self.stream.read(length)
+        self.length += len(data)
+        if self.data is not None:
+            self.data += data
+        return data
+
+    def fileno(self):
+        # The reactors select() on the stream
+        return self.stream.fileno()
+
+
+class FishingConnection(Connection):
+    """
+    pyCraft connection only parsing the packets autofish uses
+
+    pyCraft parses every packet its reactor has a definition for, and hands out the
+    rest as a bare `Packet`. The definitions of the play reactor are pruned to the
+    packets with a listener and `REACTOR_PACKETS`, so other packets are skipped
+    without being parsed. They are still read and decompressed. Skipped packets
+    and their bytes are counted through `counters.increment` if given.
+    """
+
+    # Whether `_frame_read` is given the bytes of the frame
+    keep_frames = False
+
+    def __init__(self, *args, counters=None, **kwargs):
+        self.counters = counters
+        self.listened_types = set()
+        super().__init__(*args, **kwargs)
+
+    def register_packet_listener(self, method, *packet_types, **kwargs):
+        self.listened_types.update(packet_types)
+        super().register_packet_listener(method, *packet_types, **kwargs)
+
+    @property
+    def reactor(self):
+        return self._reactor
+
+    @reactor.setter
+    def reactor(self, reactor):
+        # pyCraft replaces the reactor whenever the connection state changes
+        self._reactor = reactor
+        if isinstance(reactor, PlayingReactor):
+            wanted = self.listened_types.union(REACTOR_PACKETS)
+            reactor.clientbound_packets = {
+                packet_id: packet
+                for packet_id, packet in reactor.clientbound_packets.items()
+                if packet in wanted
+            }
+            self._hook_reads(reactor, True)
+        elif isinstance(reactor, LoginReactor):
+            self._hook_reads(reactor, False)
+
+    def _hook_reads(self, reactor, playing):
+        read_packet = reactor.read_packet
+
+        def hooked_read_packet(stream, *args, **kwargs):
+            # Compression is switched on after reading the packet enabling it
+            compressed = self.options.compression_enabled
+            counting_stream = _CountingStream(stream, keep=self.keep_frames)
+            packet = read_packet(counting_stream, *args, **kwargs)
+            if packet is not None:
+                self._frame_read(packet, playing, counting_stream, compressed)
+            return packet
+
+        reactor.read_packet = hooked_read_packet
+
+    def _frame_read(self, packet, playing, stream, compressed):
+        """Called with every packet read and the stream it was read from"""
+        if playing and type(packet) is Packet and self.counters is not None:
+            self.counters.increment("packets_skipped")
+            self.counters.increment("bytes_skipped", stream.length)
+
+
+def setup_connection(address, port, version, auth_token, state, username=None):
+    connection_class = FishingConnection
+    if state.recording is not None:
+        from autofish.capture import RecordingConnection
+
+        connection_class = partial(RecordingConnection, recording=state.recording)
+
+    connection = connection_class(
+        address,
+        port,
+        auth_token=auth_token,
+        initial_version=version,
+        username=username,
+        handle_exception=partial(handle_exception, state=state),
+        counters=state,
+    )
+    state.log.info("Connecting to %s:%s", address, port)
+
+    register_listeners(connection, state)
+
+    # Count every packet. This is done while reading in the asyncio engine
+    connection.register_packet_listener(partial(handle_packet, state=state), Packet)
+
     return connection
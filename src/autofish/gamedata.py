@@ -5,49 +5,68 @@ Used to get the sound-id for the bobber splash for a given version.
 """
 
 import json
+import os
 import sys
+import tempfile
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from json.decoder import JSONDecodeError
-from time import sleep
 
-import requests
+from minecraft import SUPPORTED_MINECRAFT_VERSIONS
 
+from autofish.backoff import Backoff
+from autofish.jsonstream import find_values, iter_file
 from autofish.versions import LATEST_VERSION, Version, is_supported
 
 BURGER_ENDPOINT = "https://pokechu22.github.io/Burger/{version}.json"
 
-BOBBER_SPLASH_SOUND_IDS = {
-    "1.9": 140,
-    "1.9.1": 140,
-    "1.9.2": 140,
-    "1.9.3": 140,
-    "1.9.4": 140,
-    "1.10": 141,
-    "1.10.1": 141,
-    "1.10.2": 141,
-    "1.11": 143,
-    "1.11.1": 143,
-    "1.11.2": 143,
-    "1.12": 153,
-    "1.12.1": 153,
-    "1.12.2": 153,
-    "1.12": 153,
-    "1.13": 184,
-    "1.13.1": 184,
-    "1.13.2": 184,
-    "1.14": 62,
-    "1.14.1": 62,
-    "1.14.2": 62,
-    "1.14.3": 62,
-    "1.14.4": 62,
-    "1.15": 73,
-    "1.15.1": 73,
-    "1.15.2": 73,
-    "1.16": 272,
-    "1.16.1": 272,
-    "1.16.2": 272,
-    "1.16.3": 272,
-    "1.16.4": 272,
-}
+# Bobber splash sound ids as (first protocol, last protocol, sound id), sorted
+# Generated with `python -m autofish.generate_sound_ids`
+BOBBER_SPLASH_SOUND_IDS = (
+    (107, 110, 140),
+    (210, 210, 141),
+    (315, 316, 143),
+    (335, 335, 153),
+    (338, 338, 153),
+    (340, 340, 153),
+    (393, 393, 184),
+    (401, 401, 184),
+    (404, 404, 184),
+    (477, 477, 62),
+    (480, 480, 62),
+    (485, 485, 62),
+    (490, 490, 62),
+    (498, 498, 62),
+    (573, 573, 73),
+    (575, 575, 73),
+    (578, 578, 73),
+    (735, 736, 272),
+    (751, 751, 272),
+    (753, 754, 272),
+)
+
+_RANGE_STARTS = [first for first, _, _ in BOBBER_SPLASH_SOUND_IDS]
+
+
+def lookup_sound_id(version):
+    """Return the hard coded bobber splash sound id for `version`, or None"""
+    protocol = SUPPORTED_MINECRAFT_VERSIONS[version]
+    i = bisect_right(_RANGE_STARTS, protocol) - 1
+    if i >= 0 and protocol <= BOBBER_SPLASH_SOUND_IDS[i][1]:
+        return BOBBER_SPLASH_SOUND_IDS[i][2]
+    return None
+
+
+# Names of the bobber splash sound, newest first
+SOUND_NAMES = ("entity.fishing_bobber.splash", "entity.bobber.splash")
+
+
+def get_sound_name(version):
+    """Return the name of the bobber splash sound in `version`"""
+    if Version(version) >= Version("1.13-pre5"):
+        return SOUND_NAMES[0]
+    else:
+        return SOUND_NAMES[1]
 
 
 def _write_cache(cache, fp):
@@ -58,21 +77,91 @@ def _load_cache(fp):
     return json.load(fp)
 
 
-def _download_sound_id(version, sound):
-    response = requests.get(
-        BURGER_ENDPOINT.format(version=requests.utils.quote(version))
-    )
-    response.raise_for_status()
+def write_cache_file(cache, path):
+    """Atomically replace the cache file at `path` with `cache`"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+        "w", dir=directory, prefix=".gamedata-", suffix=".tmp", delete=False
+    ) as f:
+        _write_cache(cache, f)
+
+    os.replace(f.name, path)
+
+
+def read_cache_file(path):
+    """Return the cache stored at `path`, or an empty cache if there is none"""
+    try:
+        with open(path, "r") as f:
+            return _load_cache(f)
+    except (OSError, IOError, JSONDecodeError):
+        return {}
+
+
+def _sound_path(sound):
+    return (0, "sounds", sound, "id")
+
+
+def read_burger_dump(path):
+    """
+    Return the version and bobber splash sound id in the Burger dump at `path`
+
+    Raises ValueError if the version is not supported.
+    Raises KeyError if the dump has no bobber splash sound.
+    """
+    version_path = (0, "version", "id")
+    with open(path, "r", encoding="UTF-8") as f:
+        # Read every candidate sound in one pass, as we don't know the version yet
+        values = find_values(
+            iter_file(f), [version_path, *map(_sound_path, SOUND_NAMES)]
+        )
+
+    # Fall back to the name of the file if the dump has no version info
+    default_version = os.path.splitext(os.path.basename(path))[0]
+    version = values.get(version_path, default_version)
+    if not is_supported(version):
+        raise ValueError(f"Version {version} in {path} is not supported")
+
+    return version, values[_sound_path(get_sound_name(version))]
+
+
+def _download_sound_ids(version, sounds, session=None):
+    """
+    Return a mapping sound->id for the sounds in `sounds`
+
+    The Burger data is streamed, and the download stops once every sound is found.
+    """
+    import requests
 
-    return response.json()[0]["sounds"][sound]["id"]
+    from autofish.httpclient import get_session
+
+    if session is None:
+        session = get_session()
+
+    with session.get(
+        BURGER_ENDPOINT.format(version=requests.utils.quote(version)), stream=True
+    ) as response:
+        response.raise_for_status()
+        values = find_values(
+            response.iter_content(chunk_size=1 << 16), map(_sound_path, sounds)
+        )
+
+    return {sound: values[_sound_path(sound)] for sound in sounds}
+
+
+def _download_sound_id(version, sound, session=None):
+    return _download_sound_ids(version, [sound], session=session)[sound]
 
 
 def _loop_download_sound_id(version, sound):
+    import requests
+
+    backoff = Backoff(base=2, maximum=30)
+
     # Try 5 times
     for i in range(5):
         try:
             _id = _download_sound_id(version, sound)
-        except (JSONDecodeError, KeyError) as e:
+        except (ValueError, KeyError) as e:
             # Failed interpreting the API
             print("Call to Burger-API failed: ", str(e))
             sys.exit(1)
@@ -89,13 +178,27 @@ def _loop_download_sound_id(version, sound):
                 # Some other error, try again in a bit
                 print(e)
                 print("Error in request to Burger-API, trying again...")
-                sleep(5)
+                backoff.sleep()
+        except requests.exceptions.RequestException as e:
+            # The connection failed, try again in a bit
+            print(e)
+            print("Error connecting to Burger-API, trying again...")
+            backoff.sleep()
         else:
             return _id
     else:
         print(f"Failed to get sound id for version {version}.")
 
 
+def check_version(version):
+    """Raise RuntimeError if `version` is not supported"""
+    if not is_supported(version):
+        raise RuntimeError(
+            f"Version {version} not supported. If you're really lucky, "
+            f"it might work with {LATEST_VERSION}."
+        )
+
+
 def get_bobber_splash_id(version, fp):
     """
     Return the bobber splash sound id for a given version.
@@ -104,16 +207,16 @@ def get_bobber_splash_id(version, fp):
     On error prints and exits.
     """
 
-    if not is_supported(version):
-        print(
-            f"Version {version} not supported. If you're really lucky, "
-            f"it might work with {LATEST_VERSION}."
-        )
+    try:
+        check_version(version)
+    except RuntimeError as e:
+        print(e)
         sys.exit(1)
 
     # Use hard coded sound ids
-    if version in BOBBER_SPLASH_SOUND_IDS:
-        return BOBBER_SPLASH_SOUND_IDS[version]
+    sound_id = lookup_sound_id(version)
+    if sound_id is not None:
+        return sound_id
 
     # Read stored cache
     try:
@@ -127,16 +230,83 @@ def get_bobber_splash_id(version, fp):
 
     if version not in cache:
         # Add the version to the cache and store the new cache
-        # Determine sound name
-        if Version(version) >= Version("1.13-pre5"):
-            sound_name = "entity.fishing_bobber.splash"
-        else:
-            sound_name = "entity.bobber.splash"
-
         print(f"Downloading sound id for version {version}")
-        cache[version] = _loop_download_sound_id(version, sound_name)
+        cache[version] = _loop_download_sound_id(version, get_sound_name(version))
 
-        with open(fp.name, "w") as fp2:
-            _write_cache(cache, fp2)
+        write_cache_file(cache, fp.name)
 
     return cache[version]
+
+
+def _try_download_sound_id(version, session, attempts=5):
+    """
+    Return the bobber splash sound id for `version` from the Burger-API
+
+    Raises RuntimeError if the sound id could not be found.
+    """
+    import requests
+
+    sound = get_sound_name(version)
+    backoff = Backoff(base=2, maximum=30)
+    for i in range(attempts):
+        try:
+            return _download_sound_id(version, sound, session=session)
+        except (ValueError, KeyError) as e:
+            raise RuntimeError(f"Call to Burger-API failed: {e}")
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 404:
+                raise RuntimeError(f"The data for version {version} does not exist")
+            error = e
+        except requests.exceptions.RequestException as e:
+            error = e
+
+        # Some other error, try again in a bit
+        backoff.sleep()
+
+    raise RuntimeError(f"Failed to get sound id for version {version}: {error}")
+
+
+def prefetch_sound_ids(versions, workers=8):
+    """
+    Download the bobber splash sound ids for every version in `versions`
+
+    Uses at most `workers` concurrent requests over the shared HTTP session.
+    Returns a tuple (sound_ids, errors) of mappings from version to sound id and
+    to error message respectively.
+    """
+    from autofish.httpclient import get_session
+
+    sound_ids = {}
+    errors = {}
+
+    session = get_session()
+    with ThreadPoolExecutor(workers) as executor:
+        futures = {
+            executor.submit(_try_download_sound_id, version, session): version
+            for version in versions
+        }
+        for future in as_completed(futures):
+            version = futures[future]
+            try:
+                sound_ids[version] = future.result()
+            except RuntimeError as e:
+                errors[version] = str(e)
+
+    return sound_ids, errors
+
+
+def import_bundle(path):
+    """
+    Return the sound ids in the file at `path`
+
+    The file is either a Burger dump or a bundle exported from a cache-file.
+    """
+    with open(path, "r", encoding="UTF-8") as f:
+        is_bundle = f.read(64).lstrip().startswith("{")
+        if is_bundle:
+            f.seek(0)
+            return json.load(f)
+
+    # Burger dumps are large, so stream them
+    version, sound_id = read_burger_dump(path)
+    return {version: sound_id}
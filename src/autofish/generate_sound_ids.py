@@ -0,0 +1,77 @@
+"""
+Generate the `BOBBER_SPLASH_SOUND_IDS` table in `autofish.gamedata` from local
+Burger dumps.
+
+Usage: python -m autofish.generate_sound_ids path/to/burger/*.json
+
+Versions using the same protocol must agree on the sound id. Consecutive
+protocol versions with the same sound id are merged into one range, so the table
+only covers protocol versions found in the dumps.
+"""
+
+import sys
+from argparse import ArgumentParser
+
+from minecraft import SUPPORTED_MINECRAFT_VERSIONS
+
+from autofish.gamedata import read_burger_dump
+
+
+def build_ranges(sound_ids):
+    """
+    Return a sorted list of (first protocol, last protocol, sound id)
+
+    `sound_ids` is a mapping version->sound id.
+    Raises ValueError if two versions with the same protocol disagree.
+    """
+    by_protocol = {}
+    for version, sound_id in sound_ids.items():
+        protocol = SUPPORTED_MINECRAFT_VERSIONS[version]
+        if by_protocol.setdefault(protocol, sound_id) != sound_id:
+            raise ValueError(
+                f"Conflicting sound ids for protocol {protocol}: "
+                f"{by_protocol[protocol]} and {sound_id} (version {version})"
+            )
+
+    ranges = []
+    for protocol in sorted(by_protocol):
+        sound_id = by_protocol[protocol]
+        if ranges and ranges[-1][1] == protocol - 1 and ranges[-1][2] == sound_id:
+            ranges[-1] = (ranges[-1][0], protocol, sound_id)
+        else:
+            ranges.append((protocol, protocol, sound_id))
+
+    return ranges
+
+
+def format_table(ranges):
+    """Return the source code for the table in `ranges`"""
+    rows = "".join(f"    {row},\n" for row in ranges)
+    return f"BOBBER_SPLASH_SOUND_IDS = (\n{rows})\n"
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("dumps", nargs="+", help="Paths to Burger .json dumps")
+    args = parser.parse_args()
+
+    sound_ids = {}
+    for path in args.dumps:
+        try:
+            version, sound_id = read_burger_dump(path)
+        except ValueError as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+            continue
+        sound_ids[version] = sound_id
+
+    try:
+        ranges = build_ranges(sound_ids)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    print(format_table(ranges), end="")
+
+
+if __name__ == "__main__":
+    main()
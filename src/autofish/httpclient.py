@@ -0,0 +1,54 @@
+"""
+Shared HTTP client used for every outbound request.
+
+Connections are pooled and kept alive between requests, and every request gets
+the same timeouts. Failed requests are not retried here, as the callers already
+retry with a `Backoff` and report each failure.
+"""
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (5, 30)
+
+# Max connections kept alive per host
+POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class _Session(requests.Session):
+    """Session applying `DEFAULT_TIMEOUT` to requests without a timeout"""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+def create_session():
+    """Return a new session with connection pooling and timeouts"""
+    session = _Session()
+
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # The session is shared between accounts, so never store cookies from responses
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    return session
+
+
+def get_session():
+    """Return the session shared by the whole process"""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
@@ -0,0 +1,77 @@
+"""
+Measure how long importing each module takes.
+
+Enabled with --startup-profile, before the rest of autofish is imported. Heavy
+dependencies are imported where they are first needed, so the report shows what
+the chosen code path actually loaded.
+"""
+
+import atexit
+import builtins
+import sys
+import threading
+from time import perf_counter
+
+# Module name -> (cumulative seconds, seconds excluding nested imports)
+_timings = {}
+_local = threading.local()
+_original_import = None
+_reported = False
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        # Relative or repeated imports are cheap, and would only add noise
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(0)
+    start = perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        _timings[name] = (elapsed, elapsed - nested)
+
+
+def enable():
+    """Start timing imports, and print a report on exit unless `report` is called"""
+    global _original_import
+
+    if _original_import is not None:
+        return
+
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+    atexit.register(report)
+
+
+def package_timings():
+    """Return a dict mapping each top-level package to the seconds spent importing it"""
+    packages = {}
+    for name, (_, own) in _timings.items():
+        package = name.partition(".")[0]
+        packages[package] = packages.get(package, 0) + own
+    return packages
+
+
+def report(limit=15):
+    """Print the import time of the slowest packages. Only prints once"""
+    global _reported
+
+    if _original_import is None or _reported:
+        return
+    _reported = True
+
+    packages = sorted(package_timings().items(), key=lambda item: -item[1])
+    total = sum(seconds for _, seconds in packages)
+
+    print(f"Imported {len(_timings)} modules in {total * 1000:.1f} ms")
+    for package, seconds in packages[:limit]:
+        print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+    if len(packages) > limit:
+        rest = sum(seconds for _, seconds in packages[limit:])
+        print(f"  {'(other)':<24} {rest * 1000:8.1f} ms")
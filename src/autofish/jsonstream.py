@@ -0,0 +1,219 @@
+"""
+Extract values from a JSON document while it is being read.
+
+Used to pick single values out of large Burger dumps without holding the whole
+document in memory, and without reading further than necessary.
+"""
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"\s*")
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"')
+_CONTAINER_TOKEN = re.compile(r'[{}\[\]"]')
+_SCALAR_END = re.compile(r"[,}\]\s]")
+_DECODER = json.JSONDecoder()
+
+
+class _Done(Exception):
+    """Raised when every requested value has been found"""
+
+
+class _Scanner:
+    def __init__(self, chunks, paths):
+        self.chunks = iter(chunks)
+        self.decoder = None
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+        self.targets = set(paths)
+        self.prefixes = {path[:i] for path in self.targets for i in range(len(path))}
+        self.found = {}
+
+    def _fill(self):
+        """Read another chunk into the buffer. Return False at the end of input"""
+        if self.eof:
+            return False
+
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                if self.decoder is None:
+                    self.decoder = codecs.getincrementaldecoder("utf-8")()
+                chunk = self.decoder.decode(chunk)
+            if chunk:
+                # Drop the part of the buffer we are done with
+                self.buffer = self.buffer[self.pos :] + chunk
+                self.pos = 0
+                return True
+
+        self.eof = True
+        return False
+
+    def _char(self):
+        """Return the next character, after skipping whitespace"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _search(self, pattern):
+        """Return the next match of `pattern`, reading more input as needed"""
+        while True:
+            match = pattern.search(self.buffer, self.pos)
+            if match is not None:
+                return match
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _skip_string(self):
+        """
+        Move past the string starting at the current position without decoding it
+
+        Returns the position the string starts at, which changes if more input
+        had to be read.
+        """
+        start = self.pos
+        while True:
+            match = _STRING_REST.match(self.buffer, start + 1)
+            if match is not None:
+                self.pos = match.end()
+                return start
+
+            # The string continues in the next chunk
+            self.pos = start
+            if not self._fill():
+                raise ValueError("Unterminated string in JSON document")
+            start = self.pos
+
+    def _read_string(self):
+        """Read a string starting at the current position and return it"""
+        start = self._skip_string()
+        return json.loads(self.buffer[start : self.pos])
+
+    def _decode(self):
+        """Decode the value at the current position"""
+        self._char()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            if not isinstance(value, (dict, list, str)) and (
+                end == len(self.buffer) or not _SCALAR_END.match(self.buffer, end)
+            ):
+                # A number or literal may continue in the next chunk
+                if self._fill():
+                    continue
+
+            self.pos = end
+            return value
+
+    def _skip(self):
+        """Skip past the value at the current position"""
+        char = self._char()
+        if char == '"':
+            self._skip_string()
+        elif char in "{[":
+            depth = 0
+            while True:
+                match = self._search(_CONTAINER_TOKEN)
+                token = match.group()
+                self.pos = match.start()
+                if token == '"':
+                    self._skip_string()
+                    continue
+
+                self.pos = match.end()
+                depth += 1 if token in "{[" else -1
+                if depth == 0:
+                    return
+        else:
+            while True:
+                match = _SCALAR_END.search(self.buffer, self.pos)
+                if match is not None:
+                    self.pos = match.start()
+                    return
+                if not self._fill():
+                    self.pos = len(self.buffer)
+                    return
+
+    def _expect(self, chars):
+        char = self._char()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self, path):
+        if path in self.targets:
+            self.found[path] = self._decode()
+            self.targets.remove(path)
+            if not self.targets:
+                raise _Done
+            return
+
+        if path not in self.prefixes:
+            self._skip()
+            return
+
+        char = self._char()
+        if char == "{":
+            self.pos += 1
+            if self._char() == "}":
+                self.pos += 1
+                return
+            while True:
+                if self._char() != '"':
+                    raise ValueError("Expected a key in JSON object")
+                key = self._read_string()
+                self._expect(":")
+                self.value(path + (key,))
+                if self._expect(",}") == "}":
+                    return
+        elif char == "[":
+            self.pos += 1
+            if self._char() == "]":
+                self.pos += 1
+                return
+            index = 0
+            while True:
+                self.value(path + (index,))
+                if self._expect(",]") == "]":
+                    return
+                index += 1
+        else:
+            self._skip()
+
+
+def find_values(chunks, paths):
+    """
+    Return the values at `paths` in the JSON document made up of `chunks`
+
+    `chunks` is an iterable of str or utf-8 encoded bytes. Each path is a tuple of
+    object keys and array indices. Reading stops as soon as every value has been
+    found. Paths that are not in the document are left out of the result.
+
+    Raises ValueError if the document is malformed.
+    """
+    scanner = _Scanner(chunks, [tuple(path) for path in paths])
+    if not scanner.targets:
+        return {}
+
+    try:
+        scanner.value(())
+    except _Done:
+        pass
+
+    return scanner.found
+
+
+def iter_file(fp, chunk_size=1 << 16):
+    """Return an iterator over chunks of the file `fp`"""
+    return iter(lambda: fp.read(chunk_size), fp.read(0))
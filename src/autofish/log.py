@@ -0,0 +1,160 @@
+"""
+Logging for every session in the process.
+
+Records are put on a queue by the thread that logs them, and formatted and
+written by a background thread, so networking threads never block on stdout.
+Each session logs through its own adapter, which attaches the account and host.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger("autofish")
+
+LEVELS = ("debug", "info", "warning", "error")
+
+# Attributes of a record that are added by the session adapters
+CONTEXT_FIELDS = ("account", "host")
+
+_listener = None
+
+
+def _timestamp(record):
+    return datetime.fromtimestamp(record.created)
+
+
+def _context(record):
+    return {
+        field: getattr(record, field)
+        for field in CONTEXT_FIELDS
+        if getattr(record, field, None) is not None
+    }
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable lines, prefixed with the time and the account if known"""
+
+    def format(self, record):
+        line = str(_timestamp(record)).ljust(30) + "\t"
+        if getattr(record, "account", None) is not None:
+            line += f"[{record.account}] "
+        if record.levelno >= logging.WARNING:
+            line += f"{record.levelname}: "
+        line += record.getMessage()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        data = {
+            "time": _timestamp(record).isoformat(),
+            "level": record.levelname.lower(),
+            **_context(record),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+class LogfmtFormatter(logging.Formatter):
+    """key=value pairs, quoting values that contain spaces or quotes"""
+
+    @staticmethod
+    def _value(value):
+        value = str(value)
+        if not value or any(char in value for char in ' "=\n'):
+            return json.dumps(value)
+        return value
+
+    def format(self, record):
+        pairs = {
+            "time": _timestamp(record).isoformat(),
+            "level": record.levelname.lower(),
+            **_context(record),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            pairs["exception"] = self.formatException(record.exc_info)
+        return " ".join(f"{key}={self._value(value)}" for key, value in pairs.items())
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Merge the arguments into the message while they can't change, but leave
+        # the exception to the formatter of the writer
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+FORMATTERS = {
+    "text": TextFormatter,
+    "json": JsonFormatter,
+    "logfmt": LogfmtFormatter,
+}
+
+
+def setup_logging(level="info", fmt="text", stream=None):
+    """
+    Send the records of the autofish logger through a queue to `stream`
+
+    `stream` defaults to stdout. The queue is drained by a background thread,
+    which is flushed and stopped on exit.
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+    handler = logging.StreamHandler(sys.stdout if stream is None else stream)
+    handler.setFormatter(FORMATTERS[fmt]())
+
+    records = queue.SimpleQueue()
+    logger.handlers = [_QueueHandler(records)]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+    _listener = QueueListener(records, handler)
+    _listener.start()
+
+
+def stop_logging():
+    """
+    Write every queued record and stop the background writer
+
+    Later records are written directly by the thread logging them.
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        logger.handlers = list(_listener.handlers)
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def session_logger(account=None, host=None):
+    """Return a logger attaching `account` and `host` to every record"""
+    return logging.LoggerAdapter(logger, {"account": account, "host": host})
+
+
+def host_name(host):
+    """Return a short name for the host in a config"""
+    # The host config is checked when connecting, which may not have happened yet
+    if host["realm"]:
+        return host.get("realm_name") or "realm"
+    return f"{host.get('address', 'unknown')}:{host.get('port', 'unknown')}"
@@ -1,10 +1,12 @@
 import getpass
 import json
+import threading
 from json.decoder import JSONDecodeError
+from time import time
 
-from minecraft import authentication
 from minecraft.exceptions import YggdrasilError
 
+from autofish.log import logger
 from autofish.realmip import loop_realm_address
 
 
@@ -41,12 +43,16 @@ def read_profile(profile_path):
     return has_token, user_data
 
 
-def create_auth_token(user_data):
+def create_auth_token(user_data, validate=True):
     """
     Creates an `AuthenticationToken` instance from `user_data`
 
     If the provided accessToken is invalid, return `None`
+    Skips validating the accessToken if `validate` is False.
     """
+    # Imports requests, which offline sessions never need
+    from minecraft import authentication
+
     auth_token = authentication.AuthenticationToken(
         username=user_data["username"],
         access_token=user_data["accessToken"],
@@ -57,8 +63,12 @@ def create_auth_token(user_data):
     )
     auth_token.profile = profile
 
+    if not validate:
+        return auth_token
+
     if auth_token.validate():
         print("Validation passed")
+        user_data["lastValidated"] = time()
         return auth_token
     else:
         print("Validation failed, attempting refresh")
@@ -69,10 +79,62 @@ def create_auth_token(user_data):
             return None
         else:
             print("Token successfully refreshed!")
+            user_data["lastValidated"] = time()
             return auth_token
 
 
+def is_recently_validated(user_data, trust_window):
+    """Return True if the token in `user_data` was validated within `trust_window`"""
+    return time() - user_data.get("lastValidated", 0) < trust_window
+
+
+def revalidate_token(auth_token, profile_path):
+    """
+    Validate `auth_token`, refreshing it if needed, and store it in the profile
+
+    Raises RuntimeError if the token is invalid and could not be refreshed.
+    """
+    try:
+        valid = auth_token.validate()
+    except YggdrasilError:
+        valid = False
+
+    if not valid:
+        try:
+            auth_token.refresh()
+        except YggdrasilError as e:
+            raise RuntimeError(
+                f"Unable to refresh token: {e}. "
+                "Restart to authenticate with username+password"
+            )
+        logger.info("Token successfully refreshed!")
+
+    _, user_data = read_profile(profile_path)
+    user_data["lastValidated"] = time()
+    update_profile(profile_path, user_data, auth_token)
+
+
+def _validate_in_background(auth_token, profile_path):
+    try:
+        revalidate_token(auth_token, profile_path)
+    except (RuntimeError, OSError) as e:
+        # A rejected session join will make us try again
+        logger.warning("Background token validation failed: %s", e)
+
+
+def validate_in_background(auth_token, profile_path):
+    """Validate `auth_token` in a background thread without blocking startup"""
+    threading.Thread(
+        target=_validate_in_background,
+        args=(auth_token, profile_path),
+        name="autofish-validate",
+        daemon=True,
+    ).start()
+
+
 def authenticate_user(user_data):
+    from minecraft import authentication
+
     while True:
         if "username" in user_data:
             # Try using stored username to authenticate
@@ -131,7 +193,8 @@ def update_profile(profile_path, user_data, auth_token):
         pro_file.write(json_data)
 
 
-def get_host_address(host, auth_token):
+def check_host_config(host):
+    """Raise RuntimeError if `host` is missing options needed to connect to it"""
     if host["realm"]:
         if "realm_name" not in host:
             raise RuntimeError("Error in host config: missing 'realm_name'")
@@ -139,11 +202,26 @@ def get_host_address(host, auth_token):
             raise RuntimeError(
                 "Error in host config: cannot connect to realm in offline mode"
             )
-        return loop_realm_address(auth_token, host["realm_name"])
-
-    if "address" not in host:
+    elif "address" not in host:
         raise RuntimeError("Error in host config: missing 'address'")
     elif "port" not in host:
         raise RuntimeError("Error in host config: missing 'port'")
 
+
+def get_host_address(host, auth_token, realm_cache_path=None):
+    """
+    Return the address and port of `host`
+
+    Realm addresses are cached at `realm_cache_path` if given.
+    Raises RuntimeError if the host config is incomplete.
+    """
+    check_host_config(host)
+    if host["realm"]:
+        return loop_realm_address(
+            auth_token,
+            host["realm_name"],
+            cache_path=realm_cache_path,
+            ttl=host["realm_cache_ttl"],
+        )
+
     return host["address"], int(host["port"])
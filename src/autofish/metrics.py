@@ -0,0 +1,136 @@
+"""
+Serve live session statistics in the Prometheus text format.
+
+The server runs in a daemon thread and only reads the session states when it is
+scraped, so it costs nothing while idle and never blocks the fishing sessions.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, type, help, function returning the value from a session state)
+METRICS = (
+    (
+        "autofish_fish_caught_total",
+        "counter",
+        "Fish caught",
+        lambda state: state.amount_caught,
+    ),
+    (
+        "autofish_reconnects_total",
+        "counter",
+        "Connections made after the first one",
+        lambda state: state.reconnects,
+    ),
+    (
+        "autofish_timeouts_total",
+        "counter",
+        "Casts that timed out",
+        lambda state: len(state.timeouts),
+    ),
+    (
+        "autofish_sleep_requests_total",
+        "counter",
+        "Sleep-requests received",
+        lambda state: state.sleep_requests,
+    ),
+    (
+        "autofish_packets_received_total",
+        "counter",
+        "Packets received from the server",
+        lambda state: state.packets_received,
+    ),
+    (
+        "autofish_fish_timeout_seconds",
+        "gauge",
+        "Seconds to wait for a bite before using the rod again",
+        lambda state: state.fish_timeout,
+    ),
+    (
+        "autofish_durability_debt",
+        "gauge",
+        "Estimated durability the rod has lost to timeouts",
+        lambda state: state.durability_count,
+    ),
+    (
+        "autofish_connected",
+        "gauge",
+        "1 if the session is connected to the server",
+        lambda state: int(state.connected),
+    ),
+)
+
+LATENCY_METRIC = "autofish_splash_latency_seconds"
+
+
+def _escape(label):
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics(sessions, start_time):
+    """Return the metrics for the (name, state) pairs in `sessions` as text"""
+    lines = [
+        "# HELP autofish_uptime_seconds Seconds since the metrics server started",
+        "# TYPE autofish_uptime_seconds gauge",
+        f"autofish_uptime_seconds {monotonic() - start_time}",
+    ]
+
+    for metric, metric_type, description, getter in METRICS:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for name, state in sessions:
+            lines.append(f'{metric}{{session="{_escape(name)}"}} {getter(state)}')
+
+    lines.append(f"# HELP {LATENCY_METRIC} Time from a bobber splash to reeling in")
+    lines.append(f"# TYPE {LATENCY_METRIC} summary")
+    for name, state in sessions:
+        histogram = state.timings["reaction"]
+        label = f'session="{_escape(name)}"'
+        for percent in (50, 95, 99):
+            value = histogram.percentile(percent)
+            if value is not None:
+                lines.append(
+                    f'{LATENCY_METRIC}{{{label},quantile="{percent / 100}"}} {value}'
+                )
+        lines.append(f"{LATENCY_METRIC}_count{{{label}}} {histogram.total}")
+
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(sessions, port, address="127.0.0.1"):
+    """
+    Serve the metrics for the (name, state) pairs in `sessions` on `address`:`port`
+
+    Returns the server. Call `shutdown` on it to stop serving.
+    """
+    start_time = monotonic()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+
+            body = render_metrics(sessions, start_time).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Don't clutter the output of the sessions
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+
+    thread = threading.Thread(
+        target=server.serve_forever, name="autofish-metrics", daemon=True
+    )
+    thread.start()
+
+    return server
@@ -1,30 +1,33 @@
+import json
+import os
 import sys
 from json import JSONDecodeError
-from time import sleep
+from time import time
 
-import requests
-
-from autofish.utils import error_msg, print_timestamped
+from autofish.backoff import Backoff
+from autofish.log import logger
+from autofish.utils import error_msg
 
 REALMS_ENDPOINT = "https://pc.realms.minecraft.net"
 
+# Status codes of the join endpoint meaning the realm id is not valid (anymore)
+INVALID_REALM_ID_STATUSES = (403, 404)
+
+
+class InvalidRealmIdError(RuntimeError):
+    """Raised when the realms API rejects the id of a realm"""
+
 
-def get_realm_address(name, uuid, access_token, realm_name, realms=REALMS_ENDPOINT):
+def get_realm_id(session, sid_cookie, realm_name, realms=REALMS_ENDPOINT):
     """
-    Return IP address and port of realm with given name.
+    Return the id of the realm with given name.
 
     Raises ValueError if no realm with given name is found.
     Raises KeyError if a key is missing in the request data.
-    Raises RuntimeError if any request fails.
+    Raises RuntimeError if the request fails.
     """
-    # Constructing session id cookie
-    sid_cookie = {}
-    sid_cookie["version"] = "1.13.1"
-    sid_cookie["user"] = name
-    sid_cookie["sid"] = f"token:{access_token}:{uuid}"
-
     # Requesting list of realms
-    worlds_response = requests.get(realms + "/worlds", cookies=sid_cookie)
+    worlds_response = session.get(realms + "/worlds", cookies=sid_cookie)
     if not worlds_response:
         raise RuntimeError(error_msg(worlds_response) + "\nAre you authenticated?")
 
@@ -39,15 +42,25 @@ def get_realm_address(name, uuid, access_token, realm_name, realms=REALMS_ENDPOI
 
     for world in worlds:
         if world["name"] == realm_name:
-            realmID = world["id"]
-            break
-    else:
-        raise ValueError(f"Realm with name '{realm_name}' not found")
+            return world["id"]
+
+    raise ValueError(f"Realm with name '{realm_name}' not found")
+
+
+def get_realm_join_address(session, sid_cookie, realm_id, realms=REALMS_ENDPOINT):
+    """
+    Return IP address and port of the realm with given id.
 
+    Raises KeyError if a key is missing in the request data.
+    Raises InvalidRealmIdError if there is no realm with the id we can join.
+    Raises RuntimeError if the request fails otherwise.
+    """
     # Requesting ip-address of selected realm
-    join_response = requests.get(
-        realms + f"/worlds/v1/{realmID}/join/pc", cookies=sid_cookie
+    join_response = session.get(
+        realms + f"/worlds/v1/{realm_id}/join/pc", cookies=sid_cookie
     )
+    if join_response.status_code in INVALID_REALM_ID_STATUSES:
+        raise InvalidRealmIdError(error_msg(join_response))
     if not join_response:
         raise RuntimeError(error_msg(join_response) + "\nIs the realm active?")
 
@@ -63,24 +76,135 @@ def get_realm_address(name, uuid, access_token, realm_name, realms=REALMS_ENDPOI
     return address, int(port)
 
 
-def loop_realm_address(auth_token, realm_name):
+def _sid_cookie(name, uuid, access_token):
+    # Constructing session id cookie
+    sid_cookie = {}
+    sid_cookie["version"] = "1.13.1"
+    sid_cookie["user"] = name
+    sid_cookie["sid"] = f"token:{access_token}:{uuid}"
+    return sid_cookie
+
+
+def get_realm_address(
+    name, uuid, access_token, realm_name, realms=REALMS_ENDPOINT, realm_id=None
+):
+    """
+    Return IP address and port of realm with given name.
+
+    The list of realms is only requested if `realm_id` is not given.
+
+    Raises ValueError if no realm with given name is found.
+    Raises KeyError if a key is missing in the request data.
+    Raises RuntimeError if any request fails.
+    """
+    from autofish.httpclient import get_session
+
+    session = get_session()
+    sid_cookie = _sid_cookie(name, uuid, access_token)
+
+    if realm_id is None:
+        realm_id = get_realm_id(session, sid_cookie, realm_name, realms=realms)
+
+    return get_realm_join_address(session, sid_cookie, realm_id, realms=realms)
+
+
+def realm_cache_path(profile_path):
+    """Return the path of the realm address cache stored next to the profile"""
+    return os.path.splitext(profile_path)[0] + "_realm.json"
+
+
+def read_realm_cache(path, realm_name):
+    """Return the cached data for the realm with given name, or an empty dict"""
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+    except (OSError, IOError, JSONDecodeError):
+        return {}
+
+    if not isinstance(cache, dict) or cache.get("realm_name") != realm_name:
+        return {}
+
+    return cache
+
+
+def write_realm_cache(path, cache):
+    with open(path, "w") as f:
+        json.dump(cache, f, sort_keys=True, indent=2)
+
+
+def invalidate_realm_address(path):
+    """
+    Forget the cached address of the realm, but keep its id
+
+    Called when connecting to the cached address fails.
+    """
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+    except (OSError, IOError, JSONDecodeError):
+        return
+
+    for key in ("address", "port", "resolved_at"):
+        cache.pop(key, None)
+
+    write_realm_cache(path, cache)
+
+
+def loop_realm_address(auth_token, realm_name, cache_path=None, ttl=0):
+    """
+    Return the IP address and port of the realm, retrying until successful
+
+    If `cache_path` is given, the address is cached there for `ttl` seconds, and
+    the id of the realm is remembered so the list of realms is only fetched once.
+    """
+    import requests
+
+    from autofish.httpclient import get_session
+
+    cache = {}
+    if cache_path is not None:
+        cache = read_realm_cache(cache_path, realm_name)
+        if "address" in cache and time() - cache["resolved_at"] < ttl:
+            return cache["address"], cache["port"]
+
+    realm_id = cache.get("realm_id")
+    sid_cookie = _sid_cookie(
+        auth_token.profile.name, auth_token.profile.id_, auth_token.access_token
+    )
+
+    backoff = Backoff(base=5, maximum=60)
+
     # Getting ip and port of realm until successful
     while True:
         try:
-            address, port = get_realm_address(
-                name=auth_token.profile.name,
-                uuid=auth_token.profile.id_,
-                access_token=auth_token.access_token,
-                realm_name=realm_name,
-            )
+            if realm_id is None:
+                realm_id = get_realm_id(get_session(), sid_cookie, realm_name)
+            address, port = get_realm_join_address(get_session(), sid_cookie, realm_id)
         except ValueError as e:
             # Could not find realm with given name
-            print_timestamped(str(e))
+            logger.error("%s", e)
             sys.exit(1)
-        except RuntimeError as e:
-            # Error in request
-            print_timestamped(str(e))
-            sleep(5)
+        except InvalidRealmIdError as e:
+            logger.warning("%s", e)
+            # The realm id may be stale - look it up again next time
+            cache = {}
+            realm_id = None
+            backoff.sleep()
+        except (RuntimeError, requests.exceptions.RequestException) as e:
+            # Error in request, like the realm still starting up. Keep the realm id
+            logger.warning("%s", e)
+            backoff.sleep()
         else:
             # Got ip and port
+            if cache_path is not None:
+                write_realm_cache(
+                    cache_path,
+                    {
+                        "realm_name": realm_name,
+                        "realm_id": realm_id,
+                        "address": address,
+                        "port": port,
+                        "resolved_at": time(),
+                    },
+                )
             return address, port
@@ -0,0 +1,333 @@
+from datetime import datetime
+from time import monotonic, time
+
+from autofish.backoff import TRANSIENT_ERRORS, Backoff, host_bucket
+from autofish.eventlog import END, RECONNECT, START, TIMEOUT, log_event
+from autofish.fishing import setup_connection, use_item
+from autofish.login import (
+    authenticate_user,
+    create_auth_token,
+    get_host_address,
+    is_recently_validated,
+    read_profile,
+    revalidate_token,
+    update_profile,
+    validate_in_background,
+)
+from autofish.realmip import invalidate_realm_address, realm_cache_path
+from autofish.state import SessionState
+from autofish.timing import adaptive_timeout, format_percentiles
+
+
+class EndFishingSession(BaseException):
+    pass
+
+
+def check_for_sleep(timeout, state):
+    """
+    Wait up to `timeout` seconds for a catch while handling sleep-requests
+
+    Returns as soon as something is caught, the connection drops, or the session is
+    stopped. The event listeners wake us up through `SessionState.set_flags`.
+    Returns True if a sleep-request was fulfilled.
+    """
+    wakeup = state.wakeup
+
+    with wakeup:
+        wakeup.wait_for(
+            lambda: state.recently_cast
+            or state.sleep_requested
+            or state.stop_requested
+            or not state.connected,
+            timeout,
+        )
+
+        if state.sleep_requested and not state.stop_requested:
+            # Stay logged off until the sleep-request is fulfilled
+            offline_start = monotonic()
+            sleep_time = state.options["sleep_time"]
+            wakeup.wait_for(lambda: state.stop_requested, sleep_time)
+            state.time_offline += monotonic() - offline_start
+
+            # Hack to prevent the client from thinking the rod timed out when
+            # we were logged off
+            state.set_flags(sleep_requested=False, recently_cast=True)
+            return True
+
+    return False
+
+
+def wait_or_stop(seconds, state):
+    """
+    Wait for `seconds` seconds
+
+    Raises EndFishingSession if the session is stopped in the meantime.
+    """
+    if state.wait_for(lambda: state.stop_requested, seconds):
+        raise EndFishingSession
+
+
+def login(host, options):
+    """
+    Authenticate the account described by `options`
+
+    Returns a tuple (auth_token, username). `auth_token` is `None` in offline mode.
+    """
+    # Read stored profile
+    has_token, user_data = read_profile(options["profile_path"])
+
+    if not host["offline"]:
+        validate_later = has_token and is_recently_validated(
+            user_data, options["token_trust_window"]
+        )
+
+        # Validate/refresh token
+        if validate_later:
+            print("Token was validated recently, validating it in the background")
+            auth_token = create_auth_token(user_data, validate=False)
+        elif has_token:
+            auth_token = create_auth_token(user_data)
+
+        # Client has no token, or the token was invalid
+        if not has_token or not auth_token:
+            print("Authenticate with username+password")
+            auth_token = authenticate_user(user_data)
+            user_data["lastValidated"] = time()
+
+        # Update profile and write to disk
+        update_profile(options["profile_path"], user_data, auth_token)
+        username = auth_token.profile.name
+
+        if validate_later:
+            validate_in_background(auth_token, options["profile_path"])
+    else:
+        print("Playing in offline mode - skipping authentication")
+        if options.get("username", None) is None:
+            options["username"] = input("What username do you want to play with? ")
+        auth_token = None
+        username = options["username"]
+
+    return auth_token, username
+
+
+def create_state(options, splash_id, log=None):
+    """
+    Return the initial state of a fishing session
+
+    `log` is the logger of the session, see `autofish.log.session_logger`.
+    """
+    state = SessionState(options, splash_id, log=log)
+    log_event(state, START)
+
+    return state
+
+
+def fish(host, auth_token, username, state, resolved_address=None):
+    """
+    Connect to `host` and fish, reconnecting indefinitely
+
+    `resolved_address` is an (address, port) tuple to use for the first connect,
+    if it has already been resolved.
+
+    Raises EndFishingSession when the session should end.
+    Raises RuntimeError if the host could not be resolved, or connecting failed
+    with an error that is not expected to go away by retrying.
+    """
+    profile_path = state.options["profile_path"]
+    cache_path = realm_cache_path(profile_path) if host["realm"] else None
+    backoff = Backoff(maximum=host["reconnect_delay_max"])
+    connected_at = None
+    slept = False
+
+    while True:
+        if state.connection is not None and not slept:
+            state.increment("reconnects")
+
+            if (
+                connected_at is not None
+                and monotonic() - connected_at > host["reconnect_delay_max"]
+            ):
+                # The last connection was healthy, so start over with short delays
+                backoff.reset()
+
+            delay = backoff.next_delay()
+            state.log.info("Reconnecting in %.1f seconds", delay)
+            log_event(state, RECONNECT, delay)
+            wait_or_stop(delay, state)
+        slept = False
+
+        if state.auth_failed:
+            # The server rejected our session, so make sure the token is valid
+            state.set_flags(auth_failed=False)
+            revalidate_token(auth_token, profile_path)
+
+        if resolved_address is not None:
+            address, port = resolved_address
+            resolved_address = None
+        else:
+            address, port = get_host_address(
+                host, auth_token, realm_cache_path=cache_path
+            )
+
+        # Limit the rate of connections to each host across all sessions
+        bucket = host_bucket(
+            f"{address}:{port}", host["connect_rate"], host["connect_burst"]
+        )
+        wait_or_stop(bucket.reserve(), state)
+
+        # Establish connection
+        connected_at = None
+        state.connection = setup_connection(
+            address=address,
+            port=port,
+            version=host["version"],
+            auth_token=auth_token,
+            state=state,
+            username=username,
+        )
+        try:
+            state.connection.connect()
+        except OSError as e:
+            if cache_path is not None:
+                # The cached realm address may be stale - resolve it again
+                state.log.warning("Could not connect to the realm: %s", e)
+                invalidate_realm_address(cache_path)
+                continue
+            if isinstance(e, TRANSIENT_ERRORS):
+                # Likely restarting - retry like a dropped connection
+                state.log.warning("Could not connect: %s", e)
+                continue
+            raise RuntimeError(e)
+
+        connected_at = monotonic()
+        state.set_flags(connected=True)
+
+        while state.connected:
+            # Check for timeouts, fishing is handled by eventlisteners
+            state.set_flags(recently_cast=False)
+            # Reconnect right away after logging off for a sleep-request
+            slept = check_for_sleep(update_fish_timeout(state), state)
+            handle_wait_result(state)
+
+
+def update_fish_timeout(state):
+    """
+    Return the seconds to wait for a bite
+
+    With `adaptive_timeout` the timeout follows the bite times seen so far,
+    between `fish_timeout_min` and `fish_timeout`.
+    """
+    options = state.options
+    if options["adaptive_timeout"]:
+        fish_timeout = adaptive_timeout(
+            state.timings["bite"],
+            len(state.timeouts),
+            options["timeout_percentile"],
+            options["fish_timeout_min"],
+            options["fish_timeout"],
+        )
+        if abs(fish_timeout - state.fish_timeout) >= 1:
+            state.log.debug("Fish timeout is now %.1f seconds", fish_timeout)
+        state.fish_timeout = fish_timeout
+
+    return state.fish_timeout
+
+
+def handle_wait_result(state):
+    """
+    Act on the outcome of waiting for a catch
+
+    Uses the rod again if we timed out.
+    Raises EndFishingSession when the session should end.
+    """
+    if state.stop_requested:
+        raise EndFishingSession
+
+    if not state.connected and not state.recently_cast:
+        # Lost the connection - the caller reconnects after a backoff delay
+        return
+
+    if state.paused:
+        # The rod is reeled in until the session is resumed
+        return
+
+    if not state.recently_cast:
+        # Timed out
+        if state.durability_count >= state.options["durability_threshold"]:
+            # Log out to save the rod
+            state.log.warning(
+                "Too many timeouts; rod has, at worst, taken ~%s "
+                "points of durability. Logging out to save it.",
+                state.durability_count,
+            )
+
+            raise EndFishingSession
+
+        state.log.warning(
+            "Timed out; more than %.0f seconds since last catch. Using the rod once.",
+            state.fish_timeout,
+        )
+        state.timeouts.append(datetime.now())
+        log_event(state, TIMEOUT, state.fish_timeout)
+        use_item(state)
+
+        # Reeling in a mob costs 5 durability
+        # This can be done at most every other use of the rod
+        state.durability_count += 5 / 2
+    else:
+        # Fishing grants 1-6 exp which each gives 2 durability
+        # The rod cannot be repaired past fully repaired
+        state.durability_count = max(0, state.durability_count - 2)
+
+
+def stop_session(state):
+    """Make the session in `state` end as soon as possible"""
+    state.set_flags(stop_requested=True)
+
+
+def end_session(state):
+    """Disconnect the session in `state` if it has a connection"""
+    if state.connection is not None:
+        state.connection.disconnect()
+    state.set_flags(connected=False)
+
+    if state.event_log is not None:
+        log_event(state, END)
+        state.event_log.close()
+        state.event_log = None
+
+    if state.recording is not None:
+        state.recording.close()
+        state.recording = None
+
+
+def print_summary(state):
+    """Print the results of the session in `state`"""
+    time_diff = datetime.now() - state.start_time
+    # Avoid dividing by zero for sessions shorter than a second
+    seconds = max(1, time_diff.days * 24 * 60 * 60 + time_diff.seconds)
+
+    print("Time elapsed:", time_diff)
+    print("Fish caught: " + str(state.amount_caught))
+    print("Fish/minute: " + str(state.amount_caught / seconds * 60))
+
+    if state.amount_caught != 0:
+        print("Seconds/fish: " + str(seconds / state.amount_caught))
+    print(
+        "Splash-to-reel latency: "
+        + format_percentiles(state.timings["reaction"], scale=1000, unit="ms")
+    )
+    print("Cast-to-bite time: " + format_percentiles(state.timings["bite"]))
+    if state.options["adaptive_timeout"]:
+        print(f"Adapted fish timeout: {state.fish_timeout:.1f}s")
+    if state.time_offline != 0:
+        print(f"Time offline for sleep-requests: {state.time_offline:.1f}s")
+    if state.packets_skipped != 0:
+        print(
+            f"Packets skipped without decoding: {state.packets_skipped} "
+            f"({state.bytes_skipped} bytes)"
+        )
+    if len(state.timeouts) != 0:
+        print("Timeouts:")
+        for t in state.timeouts:
+            print("\t" + str(t))
@@ -0,0 +1,73 @@
+"""
+Run the independent startup steps of a session concurrently.
+
+Looking up the sound id, authenticating and resolving the address of the host
+mostly wait on the network, so the time to the first cast is that of the slowest
+step rather than the sum of them.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from autofish.gamedata import check_version, get_bobber_splash_id
+from autofish.login import check_host_config, get_host_address
+from autofish.realmip import realm_cache_path
+from autofish.session import login
+
+
+def timed(timings, name, function, *args, **kwargs):
+    """Call `function`, storing the seconds it took in `timings[name]`"""
+    start = perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        timings[name] = perf_counter() - start
+
+
+def format_timings(timings):
+    return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+
+
+def start_session(host, options, gamedata_fp):
+    """
+    Look up the sound id while authenticating and resolving the host address
+
+    Authentication runs on the calling thread, as it may prompt for a password.
+    Returns a tuple (splash_id, auth_token, username, address, timings), where
+    `timings` maps the name of each stage to the seconds it took.
+    Raises RuntimeError before authenticating if the version is not supported, or
+    the host config is incomplete.
+    """
+    check_version(host["version"])
+    check_host_config(host)
+
+    timings = {}
+    start = perf_counter()
+
+    with ThreadPoolExecutor(1) as executor:
+        splash_future = executor.submit(
+            timed,
+            timings,
+            "gamedata",
+            get_bobber_splash_id,
+            host["version"],
+            fp=gamedata_fp,
+        )
+
+        auth_token, username = timed(timings, "login", login, host, options)
+        address = timed(
+            timings,
+            "address",
+            get_host_address,
+            host,
+            auth_token,
+            realm_cache_path=(
+                realm_cache_path(options["profile_path"]) if host["realm"] else None
+            ),
+        )
+
+        splash_id = splash_future.result()
+
+    timings["total"] = perf_counter() - start
+
+    return splash_id, auth_token, username, address, timings
@@ -0,0 +1,119 @@
+"""
+State of a fishing session, shared between the session loop and the listeners.
+
+The event listeners run on the networking thread of the connection, while the
+session loop waits for them on its own thread. Counters are only changed through
+`SessionState.increment`, and the flags the loop waits on through
+`SessionState.set_flags`, which wakes up the loop.
+"""
+
+import threading
+from datetime import datetime
+from types import MappingProxyType
+
+from autofish.commands import ChatCommands
+from autofish.eventlog import open_event_log
+from autofish.log import session_logger
+from autofish.timing import create_timings
+
+COUNTERS = (
+    "amount_caught",
+    "reconnects",
+    "sleep_requests",
+    "packets_received",
+    # Packets dropped without being decoded by the asyncio engine
+    "packets_skipped",
+    "bytes_skipped",
+)
+
+FLAGS = (
+    "recently_cast",
+    "sleep_requested",
+    "stop_requested",
+    # Set by the pause command, and cleared by the resume command
+    "paused",
+    # Set when the server rejects our session
+    "auth_failed",
+    "connected",
+)
+
+
+class SessionState:
+    """
+    State of one fishing session
+
+    `options` is a read-only view of the options of the session.
+    """
+
+    __slots__ = (
+        "options",
+        "bobber_splash_id",
+        "log",
+        "commands",
+        "event_log",
+        # Capture of the received packets, see `autofish.capture`
+        "recording",
+        "connection",
+        # Notified whenever one of the flags changes. Reentrant, so flags can be
+        # set while waiting on it
+        "wakeup",
+        "start_time",
+        "timeouts",
+        # Seconds to wait for a bite before using the rod again
+        "fish_timeout",
+        # Stores the potential durability that has been taken off the rod due to
+        # timeouts minus the durability recovered by mending
+        "durability_count",
+        # Seconds spent logged off due to sleep-requests
+        "time_offline",
+        # perf_counter() at the last time the rod was used
+        "last_use",
+        "timings",
+        "_counter_lock",
+        *COUNTERS,
+        *FLAGS,
+    )
+
+    def __init__(self, options, splash_id, log=None):
+        self.options = MappingProxyType(dict(options))
+        self.bobber_splash_id = splash_id
+        self.log = session_logger() if log is None else log
+        self.commands = ChatCommands(self.options)
+        self.event_log = open_event_log(options["event_log_path"])
+        self.recording = None
+        self.connection = None
+        self.wakeup = threading.Condition(threading.RLock())
+        self.start_time = datetime.now()
+        self.timeouts = []
+        self.fish_timeout = options["fish_timeout"]
+        self.durability_count = 0
+        self.time_offline = 0
+        self.last_use = None
+        self.timings = create_timings()
+        self._counter_lock = threading.Lock()
+
+        for counter in COUNTERS:
+            setattr(self, counter, 0)
+        for flag in FLAGS:
+            setattr(self, flag, False)
+
+    def increment(self, counter, amount=1):
+        """Atomically add `amount` to `counter`"""
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def set_flags(self, **flags):
+        """Set the given flags, and wake up whoever is waiting on them"""
+        with self.wakeup:
+            for flag, value in flags.items():
+                setattr(self, flag, value)
+            self.wakeup.notify_all()
+
+    def wait_for(self, predicate, timeout):
+        """
+        Wait until `predicate` is true or `timeout` seconds have passed
+
+        Returns the last value of `predicate`.
+        """
+        with self.wakeup:
+            return self.wakeup.wait_for(predicate, timeout)
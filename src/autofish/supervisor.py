@@ -0,0 +1,196 @@
+"""
+Run several fishing sessions from one process.
+
+Each session gets its own state and reconnect loop, running in its own thread.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from autofish.gamedata import check_version, get_bobber_splash_id
+from autofish.log import host_name, logger, session_logger, stop_logging
+from autofish.login import check_host_config
+from autofish.session import (
+    EndFishingSession,
+    create_state,
+    end_session,
+    fish,
+    login,
+    print_summary,
+    stop_session,
+)
+from autofish.startup import format_timings, timed
+from autofish.timing import export_timings
+
+
+def validate_sessions(sessions):
+    """
+    Check that the sessions can run side by side
+
+    Raises RuntimeError if two sessions would share a profile file or event log.
+    """
+    event_log_paths = set()
+    for i, session in enumerate(sessions):
+        event_log_path = session["options"]["event_log_path"]
+        if event_log_path in event_log_paths:
+            raise RuntimeError(
+                f"Session {i} uses the event log '{event_log_path}', which is "
+                "already used by another session. Set 'event_log_path' for each "
+                "session."
+            )
+        if event_log_path:
+            event_log_paths.add(event_log_path)
+
+    profile_paths = set()
+    for i, session in enumerate(sessions):
+        if session["host"]["offline"]:
+            continue
+
+        profile_path = session["options"]["profile_path"]
+        if profile_path in profile_paths:
+            raise RuntimeError(
+                f"Session {i} uses the profile '{profile_path}', which is already "
+                "used by another session. Set 'profile_path' for each session."
+            )
+        profile_paths.add(profile_path)
+
+
+def _run_session(name, session, state):
+    """Target of the session threads"""
+    try:
+        fish(session["host"], session["auth_token"], session["username"], state)
+    except EndFishingSession:
+        pass
+    except RuntimeError as e:
+        state.log.error("Session failed: %s", e)
+    except SystemExit:
+        state.log.info("Session exited")
+    finally:
+        end_session(state)
+
+
+def _lookup_splash_ids(sessions, gamedata_path):
+    """Return a dict mapping each version used by `sessions` to its sound id"""
+    splash_ids = {}
+    for session in sessions:
+        version = session["host"]["version"]
+        if version not in splash_ids:
+            # get_bobber_splash_id closes the file, so give it a fresh one each time
+            splash_ids[version] = get_bobber_splash_id(
+                version, fp=open(gamedata_path, "a+", encoding="UTF-8")
+            )
+    return splash_ids
+
+
+def _login_sessions(sessions):
+    # Authenticate sequentially, as this may prompt for passwords
+    for session in sessions:
+        session["auth_token"], session["username"] = login(
+            session["host"], session["options"]
+        )
+
+
+def supervise(
+    sessions,
+    gamedata_path,
+    engine="threaded",
+    timings_path=None,
+    metrics_port=None,
+    record_path=None,
+):
+    """
+    Authenticate every session in `sessions` and fish with all of them
+
+    `engine` is either "threaded", running each session in its own thread using
+    pyCraft, or "asyncio", running every session on one event loop.
+    The latency histograms of the sessions are written to `timings_path` if given,
+    and live statistics are served on `metrics_port` if given.
+    The packets each session receives are captured to `record_path` if given,
+    with the name of the session appended when there are several sessions.
+    Blocks until every session has ended, or until interrupted with Ctrl+C.
+    """
+    validate_sessions(sessions)
+    # Fail before prompting for any password
+    for session in sessions:
+        check_version(session["host"]["version"])
+        check_host_config(session["host"])
+        if engine == "asyncio" and not session["host"]["offline"]:
+            raise RuntimeError(
+                "The asyncio engine only supports servers in offline mode"
+            )
+
+    timings = {}
+    with ThreadPoolExecutor(1) as executor:
+        # Look up the sound ids while authenticating
+        splash_future = executor.submit(
+            timed, timings, "gamedata", _lookup_splash_ids, sessions, gamedata_path
+        )
+        timed(timings, "login", _login_sessions, sessions)
+        splash_ids = splash_future.result()
+
+    logger.info("Startup: %s", format_timings(timings))
+
+    running = []
+    for session in sessions:
+        splash_id = splash_ids[session["host"]["version"]]
+        log = session_logger(session["username"], host_name(session["host"]))
+        state = create_state(session["options"], splash_id, log=log)
+        if record_path is not None:
+            from autofish.capture import open_recording, session_record_path
+
+            path = record_path
+            if len(sessions) > 1:
+                path = session_record_path(record_path, session["username"])
+            state.recording = open_recording(path, session["host"]["version"])
+        running.append((session["username"], session, state))
+
+    if metrics_port is not None:
+        from autofish.metrics import start_metrics_server
+
+        start_metrics_server(
+            [(name, state) for name, _, state in running], metrics_port
+        )
+
+    if engine == "asyncio":
+        from autofish.aio import run_sessions
+
+        logger.info("Starting %s sessions", len(running))
+        run_sessions(running)
+    else:
+        _run_threads(running)
+
+    # Write pending log records before the summaries
+    stop_logging()
+
+    for name, _, state in running:
+        print(f"\nSession {name}:")
+        print_summary(state)
+
+    if timings_path is not None:
+        export_timings({name: state for name, _, state in running}, timings_path)
+
+
+def _run_threads(running):
+    """Run each session in its own thread until they have all ended"""
+    threads = []
+    for name, session, state in running:
+        thread = threading.Thread(
+            target=_run_session,
+            args=(name, session, state),
+            name=f"autofish-{name}",
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+
+    logger.info("Started %s sessions", len(threads))
+
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        logger.info("Ending sessions")
+        for _, _, state in running:
+            stop_session(state)
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,135 @@
+"""
+Bounded-memory latency histograms.
+
+Used to measure how quickly the client reacts to a bobber splash, and how long it
+takes for a fish to bite after casting. The bite times are also used to adapt the
+fish timeout.
+"""
+
+import json
+import math
+
+# Bites to record before the fish timeout is adapted
+MIN_BITES = 20
+
+
+class Histogram:
+    """
+    Histogram of positive values with logarithmically sized buckets
+
+    Like HdrHistogram, the memory use is fixed, and every value in the range
+    [`lowest`, `highest`] is stored with a relative error of at most `precision`.
+    Values outside the range are clamped to it.
+    """
+
+    def __init__(self, lowest=1e-4, highest=1e4, precision=0.01):
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+
+        self.counts = [0] * (self._index(highest) + 1)
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        value = min(max(value, self.lowest), self.highest)
+        return int(math.log(value / self.lowest) / self._log_base)
+
+    def _value(self, index):
+        """Return the value in the middle of the bucket at `index`"""
+        return self.lowest * math.exp((index + 0.5) * self._log_base)
+
+    def record(self, value):
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """Return the value at the given percentile, or None if nothing is recorded"""
+        if self.total == 0:
+            return None
+
+        return self.at_rank(max(1, math.ceil(percent / 100 * self.total)))
+
+    def at_rank(self, rank):
+        """Return the `rank`th smallest recorded value, counting from 1"""
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(max(self._value(index), self.min), self.max)
+
+    def to_dict(self):
+        """Return a json serializable representation of the histogram"""
+        return {
+            "lowest": self.lowest,
+            "highest": self.highest,
+            "precision": self.precision,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "percentiles": {
+                str(percent): self.percentile(percent) for percent in (50, 95, 99)
+            },
+            # Only store the non-empty buckets
+            "buckets": {
+                str(self._value(index)): count
+                for index, count in enumerate(self.counts)
+                if count
+            },
+        }
+
+
+def create_timings():
+    """Return the histograms kept for a session"""
+    return {
+        # Seconds from a bobber splash arriving to the rod being reeled in
+        "reaction": Histogram(),
+        # Seconds from casting the rod until a fish bites
+        "bite": Histogram(),
+    }
+
+
+def adaptive_timeout(bites, timeouts, percent, lowest, highest):
+    """
+    Return a timeout long enough for `percent` percent of the casts to get a bite
+
+    `bites` is a histogram of cast-to-bite times, and `timeouts` the number of
+    casts that timed out. A cast that timed out counts as a bite slower than any
+    recorded one, so the timeout grows again when it cuts off too many bites.
+    The result is clamped to [`lowest`, `highest`], and is `highest` until
+    `MIN_BITES` bites have been recorded.
+    """
+    if bites.total < MIN_BITES:
+        return highest
+
+    rank = math.ceil(percent / 100 * (bites.total + timeouts))
+    if rank > bites.total:
+        return highest
+
+    return min(max(bites.at_rank(max(1, rank)), lowest), highest)
+
+
+def format_percentiles(histogram, scale=1, unit="s"):
+    """Return a summary of the percentiles in `histogram`"""
+    if histogram.total == 0:
+        return "no data"
+
+    return ", ".join(
+        f"p{percent}={histogram.percentile(percent) * scale:.2f}{unit}"
+        for percent in (50, 95, 99)
+    )
+
+
+def export_timings(states, path):
+    """Write the histograms for each session in the mapping `states` to `path`"""
+    data = {
+        name: {key: histogram.to_dict() for key, histogram in state.timings.items()}
+        for name, state in states.items()
+    }
+
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
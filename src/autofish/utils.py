@@ -1,10 +1,3 @@
-from datetime import datetime
-
-
-def print_timestamped(string):
-    print(str(datetime.now()).ljust(30) + "\t" + string)
-
-
 def error_msg(response):
     """Return a pretty error message from a response"""
     return (
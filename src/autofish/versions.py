@@ -5,9 +5,17 @@ from minecraft import RELEASE_MINECRAFT_VERSIONS, SUPPORTED_MINECRAFT_VERSIONS
 LATEST_VERSION = next(reversed(RELEASE_MINECRAFT_VERSIONS))
 LATEST_RELEASE_VERSION = next(reversed(SUPPORTED_MINECRAFT_VERSIONS))
 
+# Chronological position of every supported version, computed once
+VERSION_INDEX = {
+    version: index for index, version in enumerate(SUPPORTED_MINECRAFT_VERSIONS)
+}
+
+# Supported versions in chronological order
+VERSIONS = tuple(SUPPORTED_MINECRAFT_VERSIONS)
+
 
 def is_supported(version):
-    return version in SUPPORTED_MINECRAFT_VERSIONS
+    return version in VERSION_INDEX
 
 
 @total_ordering
@@ -15,25 +23,54 @@ class Version:
     """
     Class that implements a total ordering on minecraft versions
     using the chronological order defined in pyCraft.
+
+    Instances are interned, so `Version(v) is Version(v)`.
     """
 
-    def __init__(self, version):
-        self.version = version
+    __slots__ = ("version", "_index")
+
+    _cache = {}
+
+    def __new__(cls, version):
+        try:
+            return cls._cache[version]
+        except KeyError:
+            pass
+
+        if version not in VERSION_INDEX:
+            raise ValueError(f"Version {version} is not supported by pyCraft")
+
+        instance = super().__new__(cls)
+        instance.version = version
+        instance._index = VERSION_INDEX[version]
+        return cls._cache.setdefault(version, instance)
 
     @property
     def protocol(self):
         return SUPPORTED_MINECRAFT_VERSIONS[self.version]
 
-    @property
-    def _index(self):
-        return next(
-            i
-            for i, version in enumerate(SUPPORTED_MINECRAFT_VERSIONS)
-            if version == self.version
-        )
-
     def __lt__(self, other):
         return self._index < other._index
 
     def __eq__(self, other):
-        return self.version == other.version
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self._index == other._index
+
+    def __hash__(self):
+        return self._index
+
+    def __repr__(self):
+        return f"Version({self.version!r})"
+
+
+def versions_between(start=None, end=None):
+    """
+    Return the supported versions v with `start` <= v <= `end` in order
+
+    `start` and `end` are version strings. Leaving either out leaves that end of
+    the range open.
+    """
+    first = 0 if start is None else VERSION_INDEX[start]
+    last = len(VERSIONS) - 1 if end is None else VERSION_INDEX[end]
+    return VERSIONS[first : last + 1]
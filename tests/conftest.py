@@ -13,10 +13,20 @@ from mcrcon import MCRcon
 from autofish.versions import LATEST_VERSION
 
 from .constants import MINECRAFT_PORT, RCON_PASSWORD, RCON_PORT
-from .helpers import InvalidVersionError, Server, download_file, ensure_directory_exists
+from .fakeserver import FakeServer
+from .helpers import (
+    InvalidVersionError,
+    Server,
+    download_file,
+    ensure_directory_exists,
+    prepare_splash_id,
+)
 
 DEFAULT_SERVER_CONFIGS = (f"version:{LATEST_VERSION}",)
 
+# Server config of the stand-in server in `fakeserver.py`, see `any_server`
+FAKE_SERVER_CONFIG = "fake"
+
 
 def pytest_addoption(parser):
     parser.addoption(
@@ -53,11 +63,10 @@ def java_args(request):
 # https://docs.pytest.org/en/latest/how-to/parametrize.html
 def pytest_generate_tests(metafunc):
     if "server_config" in metafunc.fixturenames:
-        metafunc.parametrize(
-            "server_config",
-            metafunc.config.getoption("server") or DEFAULT_SERVER_CONFIGS,
-            scope="session",
-        )
+        server_configs = metafunc.config.getoption("server") or DEFAULT_SERVER_CONFIGS
+        if "any_server" in metafunc.fixturenames:
+            server_configs = (*server_configs, FAKE_SERVER_CONFIG)
+        metafunc.parametrize("server_config", server_configs, scope="session")
 
 
 @pytest.fixture(scope="session")
@@ -243,8 +252,38 @@ def setup_spawn(server):
         mcr.command("/fill 0 250 0 9 251 0 minecraft:air")
 
 
+@pytest.fixture()
+def fake_server():
+    """Return a running `FakeServer`"""
+    with FakeServer() as server:
+        yield server
+
+
+@pytest.fixture()
+def any_server(request, server_config, tmp_path):
+    """
+    Return a running real server, or a `FakeServer` for `FAKE_SERVER_CONFIG`
+
+    Tests using this run against the stand-in server as well. Such tests have no
+    world to work with, and the client is started in `tmp_path`.
+    """
+    if server_config == FAKE_SERVER_CONFIG:
+        server = request.getfixturevalue("fake_server")
+        prepare_splash_id(tmp_path, server.version)
+        return server
+    return request.getfixturevalue("server")
+
+
 @pytest.fixture(autouse=True)
-def print_running_test(request, server):
+def print_running_test(request):
+    if "server" not in request.fixturenames and (
+        "any_server" not in request.fixturenames
+        or request.getfixturevalue("server_config") == FAKE_SERVER_CONFIG
+    ):
+        # Only announce tests against a real server
+        return
+
+    server = request.getfixturevalue("server")
     with MCRcon(server.host, server.rcon_password, server.rcon_port) as mcr:
         # Set world spawn so that the set area is loaded
         mcr.command(f"/say Running test '{request.node.name}'")
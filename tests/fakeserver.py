@@ -0,0 +1,376 @@
+"""
+A stand-in minecraft server speaking just enough of the protocol for autofish.
+
+Accepts offline logins, answers status queries, sends JoinGame, and records the
+UseItem and chat packets the players send. Tests script the server through the
+`FakePlayer` of each connected player.
+"""
+
+import hashlib
+import json
+import socketserver
+import threading
+import uuid
+import zlib
+from typing import Optional
+
+import pynbt
+from minecraft import SUPPORTED_MINECRAFT_VERSIONS
+from minecraft.networking.connection import ConnectionContext
+from minecraft.networking.packets import PacketBuffer, clientbound, serverbound
+from minecraft.networking.types import VarInt, Vector
+
+from autofish.versions import LATEST_RELEASE_VERSION
+
+STATUS_STATE = 1
+LOGIN_STATE = 2
+
+
+def offline_uuid(name):
+    """Return the uuid the vanilla server gives a player in offline mode"""
+    digest = hashlib.md5(f"OfflinePlayer:{name}".encode("utf-8")).digest()
+    return str(uuid.UUID(bytes=digest, version=3))
+
+
+def read_packet(rfile, context, packet_types, compression_threshold=None):
+    """
+    Read a packet from `rfile`
+
+    Returns a tuple (packet id, packet), where packet is None if its type is not in
+    `packet_types`. Raises EOFError when the connection is closed.
+    """
+    length = VarInt.read(rfile)
+    data = rfile.read(length)
+    if len(data) < length:
+        raise EOFError("Connection closed in the middle of a packet")
+
+    buffer = PacketBuffer()
+    buffer.send(data)
+    buffer.reset_cursor()
+
+    if compression_threshold is not None:
+        decompressed_size = VarInt.read(buffer)
+        if decompressed_size > 0:
+            payload = zlib.decompress(buffer.read())
+            buffer = PacketBuffer()
+            buffer.send(payload)
+            buffer.reset_cursor()
+
+    packet_id = VarInt.read(buffer)
+    packet_type = packet_types.get(packet_id)
+    if packet_type is None:
+        return packet_id, None
+
+    packet = packet_type(context)
+    packet.read(buffer)
+    return packet_id, packet
+
+
+def packet_types(packets, context, wanted=None):
+    """Return a mapping id->packet type for the packets in `packets`"""
+    return {
+        packet.get_id(context): packet
+        for packet in packets.get_packets(context)
+        if wanted is None or packet in wanted
+    }
+
+
+class FakePlayer:
+    """A player connected to the `FakeServer`, with everything it has sent"""
+
+    def __init__(self, server, name, connection):
+        self.server = server
+        self.name = name
+        self.connection = connection
+        self.uuid = offline_uuid(name)
+        self.use_item_count = 0
+        self.chat_messages = []
+        self.connected = True
+
+    def wait_for(self, predicate, timeout=10):
+        """Wait until `predicate(self)` is true. Raises TimeoutError on timeout"""
+        return self.server.wait_for(lambda: predicate(self), timeout)
+
+    def play_sound(self, sound_id):
+        self.connection.send_packet(
+            clientbound.play.SoundEffectPacket(
+                sound_id=sound_id,
+                sound_category=0,
+                effect_position=Vector(0, 64, 0),
+                volume=1.0,
+                pitch=1.0,
+            )
+        )
+
+    def send_chat(self, sender, message):
+        """Send a chat message as if `sender` wrote it"""
+        self.connection.send_packet(
+            clientbound.play.ChatMessagePacket(
+                json_data=json.dumps(
+                    {
+                        "translate": "chat.type.text",
+                        "with": [
+                            {"insertion": sender, "text": sender},
+                            message,
+                        ],
+                    }
+                ),
+                position=clientbound.play.ChatMessagePacket.Position.CHAT,
+                sender=offline_uuid(sender),
+            )
+        )
+
+    def disconnect(self, reason="Disconnected by the test"):
+        self.connection.send_packet(
+            clientbound.play.DisconnectPacket(json_data=json.dumps({"text": reason}))
+        )
+        self.connection.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handles one connection to the `FakeServer`"""
+
+    def setup(self):
+        super().setup()
+        self.fake_server = self.server.fake_server
+        self.context = self.fake_server.context
+        self.compression_threshold = None
+        self.send_lock = threading.Lock()
+
+    def send(self, data):
+        """Used by pyCraft's `Packet.write`"""
+        self.wfile.write(data)
+
+    def send_packet(self, packet):
+        packet.context = self.context
+        with self.send_lock:
+            try:
+                packet.write(self, self.compression_threshold)
+            except OSError:
+                pass
+
+    def close(self):
+        try:
+            self.request.shutdown(2)
+        except OSError:
+            pass
+
+    def read_packet(self, types):
+        return read_packet(self.rfile, self.context, types, self.compression_threshold)
+
+    def handle(self):
+        try:
+            _, handshake = self.read_packet(
+                packet_types(serverbound.handshake, self.context)
+            )
+            if handshake.next_state == STATUS_STATE:
+                self.handle_status()
+            elif handshake.next_state == LOGIN_STATE:
+                self.handle_login(handshake)
+        except EOFError:
+            pass
+        except OSError:
+            pass
+
+    def handle_status(self):
+        types = packet_types(serverbound.status, self.context)
+        while True:
+            _, packet = self.read_packet(types)
+            if isinstance(packet, serverbound.status.RequestPacket):
+                response = {
+                    "version": {
+                        "name": self.fake_server.version,
+                        "protocol": self.context.protocol_version,
+                    },
+                    "players": {"max": 20, "online": len(self.fake_server.players)},
+                    "description": {"text": "autofish test server"},
+                }
+                self.send_packet(
+                    clientbound.status.ResponsePacket(
+                        json_response=json.dumps(response)
+                    )
+                )
+            elif isinstance(packet, serverbound.status.PingPacket):
+                self.send_packet(
+                    clientbound.status.PingResponsePacket(time=packet.time)
+                )
+
+    def handle_login(self, handshake):
+        if handshake.protocol_version != self.context.protocol_version:
+            self.send_packet(
+                clientbound.login.DisconnectPacket(
+                    json_data=json.dumps(
+                        {"text": f"This server runs {self.fake_server.version}"}
+                    )
+                )
+            )
+            return
+
+        _, login_start = self.read_packet(
+            packet_types(
+                serverbound.login,
+                self.context,
+                wanted=(serverbound.login.LoginStartPacket,),
+            )
+        )
+        name = login_start.name
+
+        threshold = self.fake_server.compression_threshold
+        if threshold is not None:
+            self.send_packet(
+                clientbound.login.SetCompressionPacket(threshold=threshold)
+            )
+            self.compression_threshold = threshold
+
+        player = FakePlayer(self.fake_server, name, self)
+        self.send_packet(
+            clientbound.login.LoginSuccessPacket(UUID=player.uuid, Username=name)
+        )
+        self.send_packet(self.fake_server.join_game_packet())
+
+        self.fake_server.add_player(player)
+        try:
+            self.handle_play(player)
+        finally:
+            with self.fake_server.changed:
+                player.connected = False
+                self.fake_server.changed.notify_all()
+
+    def handle_play(self, player):
+        types = packet_types(
+            serverbound.play,
+            self.context,
+            wanted=(serverbound.play.UseItemPacket, serverbound.play.ChatPacket),
+        )
+        while True:
+            _, packet = self.read_packet(types)
+            if (
+                isinstance(packet, serverbound.play.UseItemPacket)
+                and self.fake_server.on_use_item is not None
+            ):
+                self.fake_server.on_use_item(player)
+
+            with self.fake_server.changed:
+                if isinstance(packet, serverbound.play.UseItemPacket):
+                    player.use_item_count += 1
+                elif isinstance(packet, serverbound.play.ChatPacket):
+                    player.chat_messages.append(packet.message)
+                self.fake_server.changed.notify_all()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeServer:
+    """
+    Minecraft server in offline mode running in a background thread
+
+    Has the attributes of `tests.helpers.Server` that clients need, so it can be
+    passed to `ManagedClient`. Use as a context manager, or call `start` and
+    `stop`. Binds to a free port unless `port` is given.
+    """
+
+    rcon_port: Optional[int] = None
+    rcon_password: Optional[str] = None
+    process = None
+
+    def __init__(
+        self,
+        version=LATEST_RELEASE_VERSION,
+        host="localhost",
+        port=0,
+        compression_threshold=None,
+    ):
+        self.version = version
+        self.host = host
+        self.port = port
+        self.compression_threshold = compression_threshold
+        self.context = ConnectionContext(
+            protocol_version=SUPPORTED_MINECRAFT_VERSIONS[version]
+        )
+
+        # Latest connection of each player, and the number of logins
+        self.players = {}
+        self.logins = 0
+        self.changed = threading.Condition()
+
+        # Called with the player whenever a player uses an item
+        self.on_use_item = None
+
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = _TCPServer((self.host, self.port), _Handler)
+        self._server.fake_server = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        for player in self.players.values():
+            player.connection.close()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def add_player(self, player):
+        with self.changed:
+            self.players[player.name] = player
+            self.logins += 1
+            self.changed.notify_all()
+
+    def wait_for(self, predicate, timeout=10):
+        """Wait until `predicate()` is true. Raises TimeoutError on timeout"""
+        with self.changed:
+            if not self.changed.wait_for(predicate, timeout):
+                raise TimeoutError("The fake server timed out waiting for the client")
+
+    def wait_for_player(self, name, timeout=10):
+        """Return the player called `name` once it has joined"""
+        self.wait_for(
+            lambda: name in self.players and self.players[name].connected, timeout
+        )
+        return self.players[name]
+
+    def wait_for_login(self, count, timeout=10):
+        """Wait until there have been `count` logins in total"""
+        self.wait_for(lambda: self.logins >= count, timeout)
+
+    def join_game_packet(self):
+        """Return the JoinGame packet sent to every player after logging in"""
+        return clientbound.play.JoinGamePacket(
+            entity_id=1,
+            is_hardcore=False,
+            game_mode=0,
+            previous_game_mode=0,
+            world_names=["minecraft:overworld"],
+            dimension_codec=pynbt.NBTFile(value={}),
+            dimension=(
+                pynbt.NBTFile(value={})
+                if self.context.protocol_later_eq(748)
+                else (
+                    "minecraft:overworld" if self.context.protocol_later_eq(718) else 0
+                )
+            ),
+            world_name="minecraft:overworld",
+            hashed_seed=0,
+            difficulty=0,
+            max_players=20,
+            level_type="flat",
+            render_distance=2,
+            reduced_debug_info=False,
+            respawn_screen=True,
+            is_debug=False,
+            is_flat=True,
+        )
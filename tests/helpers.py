@@ -12,8 +12,13 @@ import requests
 import toml
 from mcrcon import MCRcon
 
+from autofish.gamedata import lookup_sound_id, write_cache_file
+
 from .constants import DEFAULT_CONFIG, FISHING_USERNAME
 
+# Sound id used for versions without a built-in bobber splash id
+FALLBACK_SPLASH_ID = 1000
+
 
 class InvalidVersionError(ValueError):
     pass
@@ -44,6 +49,21 @@ def download_file(url, path, chunk_size=128, sha1=False):
     return m.hexdigest() if sha1 else None
 
 
+def prepare_splash_id(client_dir: Path, version):
+    """
+    Return the bobber splash id a client in `client_dir` will listen for
+
+    For versions without a built-in id, `FALLBACK_SPLASH_ID` is written to the
+    cache of the client to keep it from downloading the id. Only use this with a
+    server that plays the sounds itself, like `tests.fakeserver.FakeServer`.
+    """
+    sound_id = lookup_sound_id(version)
+    if sound_id is None:
+        sound_id = FALLBACK_SPLASH_ID
+        write_cache_file({version: sound_id}, str(client_dir / "gamedata.json"))
+    return sound_id
+
+
 def ensure_directory_exists(path: Path):
     if not path.is_dir():
         path.mkdir(exist_ok=True)
@@ -55,8 +75,15 @@ def start_client(
     host_override={},
     options_override={},
     capture_output=True,
+    extra_args=(),
+    sessions=(),
 ):
-    """Start a client process with the given config"""
+    """
+    Start a client process with the given config and command line arguments
+
+    Each table in `sessions` adds a session to the config, inheriting the host and
+    options.
+    """
     config = deepcopy(DEFAULT_CONFIG)
     config["options"] = {**config["options"], **options_override}
     config["host"] = {
@@ -66,6 +93,8 @@ def start_client(
         "version": server.version,
         **host_override,
     }
+    if sessions:
+        config["sessions"] = list(sessions)
     os.chdir(client_dir)
     config_path = str(client_dir / "config.toml")
     with open(config_path, "w") as config_file:
@@ -74,7 +103,7 @@ def start_client(
     output_pipe = subprocess.PIPE if capture_output else None
 
     return subprocess.Popen(
-        ("python", "-u", "-m", "autofish", "--config", config_path),
+        ("python", "-u", "-m", "autofish", "--config", config_path, *extra_args),
         stdout=output_pipe,
         stderr=output_pipe,
         text=True,
@@ -135,6 +164,7 @@ class ManagedClient:
     host_override: Optional[dict] = None
     options_override: Optional[dict] = None
     capture_output: bool = True
+    extra_args: tuple = ()
     process: Optional[subprocess.Popen] = None
 
     def __enter__(self):
@@ -144,6 +174,7 @@ class ManagedClient:
             host_override=self.host_override or {},
             options_override=self.options_override or {},
             capture_output=self.capture_output,
+            extra_args=self.extra_args,
         )
         wait_for_login(self.process)
         return self.process
@@ -0,0 +1,104 @@
+import json
+import re
+
+import pytest
+
+from autofish.commands import ChatCommands, Position, parse_chat
+from autofish.config import DEFAULT_OPTIONS
+
+
+def create_commands(**options):
+    return ChatCommands({**DEFAULT_OPTIONS, **options})
+
+
+def chat_json(sender, message, ensure_ascii=True):
+    return json.dumps(
+        {
+            "translate": "chat.type.text",
+            "with": [{"insertion": sender, "text": sender}, message],
+        },
+        ensure_ascii=ensure_ascii,
+    )
+
+
+def html_escaped(json_data):
+    """Escape `json_data` like a json encoder escaping html characters"""
+    for char in "<>&='":
+        json_data = json_data.replace(char, f"\\u{ord(char):04x}")
+    return json_data
+
+
+def upper_case_escapes(json_data):
+    """Use upper case hex digits in the \\uXXXX escapes of `json_data`"""
+    return re.sub(
+        r"\\u([0-9a-f]{4})", lambda match: "\\u" + match.group(1).upper(), json_data
+    )
+
+
+def test_lookup():
+    commands = create_commands(status_command="status")
+
+    assert commands.lookup("player", "sleep", now=0) == "sleep"
+    assert commands.lookup("player", "status", now=100) == "status"
+    assert commands.lookup("player", "Sleep", now=200) is None
+    assert commands.lookup("player", "hello there", now=300) is None
+
+
+def test_allowlist_is_case_folded():
+    commands = create_commands(command_allowlist=["Fisher", "STRASSE"])
+
+    assert commands.lookup("fisher", "sleep", now=0) == "sleep"
+    assert commands.lookup("straße", "sleep", now=0) == "sleep"
+    assert commands.lookup("griefer", "sleep", now=0) is None
+
+
+def test_cooldown():
+    commands = create_commands(command_cooldown=5)
+
+    assert commands.lookup("player", "sleep", now=100) == "sleep"
+    assert commands.lookup("Player", "sleep", now=104.9) is None
+    # Other players have their own cooldown
+    assert commands.lookup("other", "sleep", now=104.9) == "sleep"
+    assert commands.lookup("player", "sleep", now=105) == "sleep"
+
+
+def test_disabled_commands():
+    commands = create_commands(sleep_helper=False)
+
+    assert not commands
+    assert commands.lookup("player", "sleep", now=0) is None
+    assert not commands.match(chat_json("player", "sleep"))
+
+
+@pytest.mark.parametrize(
+    "message",
+    ("sleep", "søvn", "☃", "😴 zz", 'say "sleep"', "zzz<3", "a=b&c", "tab\there"),
+)
+@pytest.mark.parametrize("ensure_ascii", (False, True))
+def test_match_has_no_false_negatives(message, ensure_ascii):
+    """Assert that every way of encoding a command passes the prefilter"""
+    commands = create_commands(sleep_command=message)
+    json_data = chat_json("player", message, ensure_ascii=ensure_ascii)
+
+    assert commands.needles is not None
+    assert commands.match(json_data)
+    assert commands.match(html_escaped(json_data))
+    assert commands.match(upper_case_escapes(json_data))
+
+    sender, parsed = parse_chat(json_data, Position.CHAT)
+    assert commands.lookup(sender, parsed, now=0) == "sleep"
+
+
+def test_match_filters_other_messages():
+    commands = create_commands(sleep_command="søvn", status_command="status")
+
+    assert not commands.match(chat_json("player", "hello there"))
+    assert not commands.match(chat_json("player", "sovn", ensure_ascii=False))
+
+
+def test_match_without_needle():
+    """Commands made of characters that may be escaped can't be prefiltered"""
+    commands = create_commands(sleep_command="<>")
+
+    assert commands.needles is None
+    assert commands.match(chat_json("player", "hello there"))
@@ -0,0 +1,103 @@
+import pytest
+
+from autofish.eventlog import (
+    CATCH,
+    END,
+    MAGIC,
+    RECONNECT,
+    RECORD,
+    START,
+    EventLog,
+    aggregate,
+    read_events,
+)
+
+
+def write_log(path, events):
+    """Write a log with the (time, kind, value) tuples in `events`"""
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for event in events:
+            f.write(RECORD.pack(*event))
+
+
+def test_write_and_read(tmp_path):
+    path = tmp_path / "fisherman.evlog"
+    log = EventLog(path)
+    log.write(START)
+    log.write(CATCH, 12.5)
+    log.close()
+
+    events = read_events(path)
+    assert [(kind, value) for _, kind, value in events] == [(START, 0), (CATCH, 12.5)]
+
+
+def test_not_an_event_log(tmp_path):
+    path = tmp_path / "other.txt"
+    path.write_bytes(b"something else entirely")
+
+    with pytest.raises(RuntimeError):
+        EventLog(path)
+    with pytest.raises(ValueError):
+        read_events(path)
+
+
+@pytest.mark.parametrize("torn", (1, 3, RECORD.size - 1))
+def test_torn_tail(tmp_path, torn):
+    """Assert that a partially written record doesn't misalign later records"""
+    path = tmp_path / "fisherman.evlog"
+    write_log(path, [(1000.0, START, 0), (1010.0, CATCH, 10)])
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(1020.0, CATCH, 10)[:torn])
+
+    assert len(read_events(path)) == 2
+
+    log = EventLog(path)
+    log.write(END)
+    log.close()
+
+    events = read_events(path)
+    assert [kind for _, kind, _ in events] == [START, CATCH, END]
+    assert events[0][0] == 1000.0
+    assert aggregate([path])["seconds"] >= 0
+
+
+@pytest.mark.parametrize("torn", (0, 3))
+def test_torn_magic(tmp_path, torn):
+    path = tmp_path / "fisherman.evlog"
+    path.write_bytes(MAGIC[:torn])
+
+    log = EventLog(path)
+    log.write(START)
+    log.close()
+
+    assert [kind for _, kind, _ in read_events(path)] == [START]
+
+
+def test_aggregate(tmp_path):
+    day = 86400 * 20000
+    first = tmp_path / "first.evlog"
+    write_log(
+        first,
+        [
+            (day + 0.0, START, 0),
+            (day + 10.0, CATCH, 10),
+            (day + 20.0, RECONNECT, 1),
+            (day + 30.0, CATCH, 8),
+            (day + 100.0, END, 0),
+            # Killed without logging the end
+            (day + 200.0, START, 0),
+            (day + 250.0, CATCH, 50),
+        ],
+    )
+    second = tmp_path / "second.evlog"
+    write_log(second, [(2 * day, START, 0), (2 * day + 50.0, END, 0)])
+
+    stats = aggregate([first, second])
+
+    assert stats["sessions"] == 3
+    assert stats["seconds"] == 100 + 50 + 50
+    assert stats["catches"] == 3
+    assert stats["reconnects"] == 1
+    assert stats["timeouts"] == 0
+    assert sum(stats["days"].values()) == 3
@@ -0,0 +1,180 @@
+"""
+End-to-end tests against the stand-in server in `fakeserver.py`
+
+The tests in `test_tests.py` that need no world also run against it.
+"""
+
+import time
+
+import pytest
+
+from autofish.capture import create_context, read_recording, replay
+from autofish.config import DEFAULT_OPTIONS
+from autofish.session import create_state
+
+from .constants import FISHING_USERNAME
+from .fakeserver import FakeServer
+from .helpers import ManagedClient, prepare_splash_id
+
+
+@pytest.fixture()
+def splash_id(fake_server, tmp_path):
+    """Return the bobber splash id the client will listen for"""
+    return prepare_splash_id(tmp_path, fake_server.version)
+
+
+def test_bobber_cast_on_login(fake_server, tmp_path, splash_id):
+    with ManagedClient(tmp_path, fake_server):
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.wait_for(lambda player: player.use_item_count == 1)
+
+
+def test_catches_fish(fake_server, tmp_path, splash_id):
+    with ManagedClient(tmp_path, fake_server) as client_process:
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.wait_for(lambda player: player.use_item_count == 1)
+
+        # Sounds other than the splash are ignored
+        player.play_sound(splash_id + 1)
+        player.play_sound(splash_id)
+
+        # Reel in and cast again
+        player.wait_for(lambda player: player.use_item_count == 3)
+
+    stdout, stderr = client_process.communicate()
+
+    assert "Caught one!" in stdout
+
+
+def test_recasts_on_timeout(fake_server, tmp_path, splash_id):
+    with ManagedClient(tmp_path, fake_server, options_override={"fish_timeout": 1}):
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.wait_for(lambda player: player.use_item_count >= 2)
+
+
+def test_sleep_request(fake_server, tmp_path, splash_id):
+    options = {"sleep_command": "sleep", "sleep_time": 1}
+    with ManagedClient(
+        tmp_path, fake_server, options_override=options
+    ) as client_process:
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.send_chat("sleepyhead", "sleep")
+
+        # Log off, and come back once the sleep time has passed
+        player.wait_for(lambda player: not player.connected)
+        fake_server.wait_for_login(2)
+
+    stdout, stderr = client_process.communicate()
+
+    # Logging back on after sleeping is no reconnect
+    assert "Reconnecting in" not in stdout
+
+
+def test_reconnects_after_disconnect(fake_server, tmp_path, splash_id):
+    with ManagedClient(tmp_path, fake_server):
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.disconnect()
+
+        fake_server.wait_for_login(2)
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.wait_for(lambda player: player.use_item_count == 1)
+
+
+def test_reconnects_after_server_restart(fake_server, tmp_path, splash_id):
+    with ManagedClient(tmp_path, fake_server) as client_process:
+        fake_server.wait_for_player(FISHING_USERNAME)
+        fake_server.stop()
+
+        # Refuse connections for a while, like a restarting server
+        time.sleep(2)
+        with FakeServer(fake_server.version, port=fake_server.port) as restarted:
+            restarted.wait_for_player(FISHING_USERNAME, timeout=20)
+
+        assert client_process.poll() is None
+
+
+def test_record_and_replay(fake_server, tmp_path, splash_id):
+    """Assert that replaying a capture catches the same fish as the live session"""
+    capture_path = tmp_path / "capture.afc"
+    with ManagedClient(
+        tmp_path, fake_server, extra_args=("--record", str(capture_path))
+    ):
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.wait_for(lambda player: player.use_item_count == 1)
+        player.play_sound(splash_id)
+        player.wait_for(lambda player: player.use_item_count == 3)
+
+    version, frames = read_recording(capture_path)
+    assert version == fake_server.version
+
+    state = create_state(DEFAULT_OPTIONS, splash_id)
+    connection = replay(frames, state, create_context(version))
+
+    assert state.amount_caught == 1
+    # Cast on join, then reel in and cast again
+    assert len(connection.packets_written) >= 3
+
+
+def test_chat_commands(fake_server, tmp_path, splash_id):
+    options = {
+        "status_command": "status",
+        "pause_command": "pause",
+        "resume_command": "resume",
+        "command_cooldown": 0,
+    }
+
+    def status_replies(player):
+        return [message for message in player.chat_messages if "fish so far" in message]
+
+    with ManagedClient(tmp_path, fake_server, options_override=options):
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.wait_for(lambda player: player.use_item_count == 1)
+
+        player.send_chat("friend", "status")
+        player.wait_for(lambda player: len(status_replies(player)) == 1)
+
+        # Reel in, and ignore bites until resumed
+        player.send_chat("friend", "pause")
+        player.wait_for(lambda player: player.use_item_count == 2)
+        player.play_sound(splash_id)
+        player.send_chat("friend", "resume")
+
+        # The client handles the messages in order
+        player.send_chat("friend", "status")
+        player.wait_for(lambda player: len(status_replies(player)) == 2)
+
+    assert player.use_item_count == 3
+    assert status_replies(player)[0].startswith("Fishing for")
+
+
+def test_command_allowlist(fake_server, tmp_path, splash_id):
+    options = {"status_command": "status", "command_allowlist": ["Friend"]}
+
+    with ManagedClient(tmp_path, fake_server, options_override=options):
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        # Wait for the greeting and the sleep message
+        player.wait_for(lambda player: len(player.chat_messages) == 2)
+        messages_before = len(player.chat_messages)
+
+        # The client handles the messages in order
+        player.send_chat("stranger", "status")
+        player.send_chat("friend", "status")
+        player.wait_for(lambda player: len(player.chat_messages) > messages_before)
+
+    assert len(player.chat_messages) == messages_before + 1
+
+
+def test_adaptive_timeout(fake_server, tmp_path, splash_id):
+    """Assert that the timeout shrinks when fish bite quickly"""
+    options = {"adaptive_timeout": True, "fish_timeout_min": 1, "fish_timeout": 60}
+    with ManagedClient(tmp_path, fake_server, options_override=options):
+        player = fake_server.wait_for_player(FISHING_USERNAME)
+        player.wait_for(lambda player: player.use_item_count == 1)
+
+        # Reel in and cast again after every splash
+        for catch in range(1, 21):
+            player.play_sound(splash_id)
+            player.wait_for(lambda player: player.use_item_count == 1 + 2 * catch)
+
+        # Much sooner than the configured fish_timeout
+        player.wait_for(lambda player: player.use_item_count == 42, timeout=10)
@@ -0,0 +1,93 @@
+import io
+import json
+
+import pytest
+
+from autofish.jsonstream import find_values, iter_file
+
+DOCUMENT = {
+    "version": {"id": "1.16.4", "protocol": 754},
+    "sounds": {
+        "entity.fishing_bobber.splash": {"id": 73, "name": "splash"},
+        "block.note_block.harp": {"id": 1000, "name": "harp"},
+    },
+    "escaped": 'quote " backslash \\ unicode æøå ☃',
+    "list": [1, -2.5e3, True, None, "\\]}", {"nested": [False, "x"]}],
+    # Skipped without being decoded
+    "skipped": ['say "}" \\', {'key \\"{': '\\\\"'}],
+    "after": "found",
+}
+
+
+def chunked(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+PATHS = [
+    ("version", "id"),
+    ("sounds", "block.note_block.harp", "id"),
+    ("escaped",),
+    ("list", 1),
+    ("list", 5, "nested", 1),
+    ("after",),
+]
+
+EXPECTED = {
+    ("version", "id"): "1.16.4",
+    ("sounds", "block.note_block.harp", "id"): 1000,
+    ("escaped",): DOCUMENT["escaped"],
+    ("list", 1): -2.5e3,
+    ("list", 5, "nested", 1): "x",
+    ("after",): "found",
+}
+
+
+@pytest.mark.parametrize("size", (1, 2, 3, 7, 1 << 16))
+@pytest.mark.parametrize("ensure_ascii", (False, True))
+def test_chunk_boundaries(size, ensure_ascii):
+    """Assert that values split over any chunk boundary are found"""
+    text = json.dumps(DOCUMENT, ensure_ascii=ensure_ascii, indent=1)
+
+    assert find_values(chunked(text, size), PATHS) == EXPECTED
+
+
+@pytest.mark.parametrize("size", (1, 2, 5))
+def test_bytes_chunks(size):
+    """Assert that multi-byte characters split between chunks are decoded"""
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+
+    assert find_values(chunked(data, size), PATHS) == EXPECTED
+
+
+def test_iter_file():
+    text = json.dumps(DOCUMENT, ensure_ascii=False)
+
+    for fp in (io.StringIO(text), io.BytesIO(text.encode("utf-8"))):
+        assert find_values(iter_file(fp, chunk_size=4), PATHS) == EXPECTED
+
+
+def test_missing_keys():
+    text = json.dumps(DOCUMENT)
+    paths = [("version", "id"), ("version", "name"), ("list", 10), ("missing", 0)]
+
+    assert find_values(chunked(text, 3), paths) == {("version", "id"): "1.16.4"}
+    assert find_values([text], []) == {}
+
+
+def test_stops_reading():
+    """Assert that no more chunks are read once every value has been found"""
+    read = []
+
+    def chunks():
+        for chunk in chunked(json.dumps(DOCUMENT), 8):
+            read.append(chunk)
+            yield chunk
+
+    assert find_values(chunks(), [("version", "id")]) == {("version", "id"): "1.16.4"}
+    assert len(read) < len(chunked(json.dumps(DOCUMENT), 8)) // 2
+
+
+@pytest.mark.parametrize("text", ('{"version": {"id": "1.16', '{"version" 1}', "[1 2]"))
+def test_malformed(text):
+    with pytest.raises(ValueError):
+        find_values(chunked(text, 4), [("version", "id"), (1,)])
@@ -5,40 +5,55 @@ import pytest
 from mcrcon import MCRcon
 
 from .constants import DEFAULT_CONFIG, FISHING_USERNAME
+from .fakeserver import FakeServer
 from .helpers import ManagedClient, setup_for_fishing
 
 
-def test_login(server, tmp_path):
-    """Assert that the client is able to log in properly"""
-    with MCRcon(server.host, server.rcon_password, server.rcon_port) as mcr:
-        response = mcr.command("/list")
-
-    assert FISHING_USERNAME not in response
+def online_players(server):
+    """Return a string containing the names of the players online on `server`"""
+    if isinstance(server, FakeServer):
+        with server.changed:
+            return " ".join(
+                name for name, player in server.players.items() if player.connected
+            )
 
-    with ManagedClient(tmp_path, server):
-        time.sleep(1)  # Ensure we have time to login
+    with MCRcon(server.host, server.rcon_password, server.rcon_port) as mcr:
+        return mcr.command("/list")
 
-        with MCRcon(server.host, server.rcon_password, server.rcon_port) as mcr:
-            response = mcr.command("/list")
 
-        assert FISHING_USERNAME in response
+def test_login(any_server, tmp_path):
+    """Assert that the client is able to log in properly"""
+    server = any_server
 
+    assert FISHING_USERNAME not in online_players(server)
 
-@pytest.mark.parametrize("should_greet", (False, True))
-@pytest.mark.parametrize("should_sleep", (False, True))
-def test_messages(server, tmp_path, should_greet, should_sleep):
-    """Assert that the greet/sleep helper messages are sent according to preference"""
-    if server.process is None:
-        pytest.skip(
-            "We need to read from the server process to determine if messages were "
-            "sent. This does not work when using an external server for the tests."
-        )
+    with ManagedClient(tmp_path, server):
+        if isinstance(server, FakeServer):
+            server.wait_for_player(FISHING_USERNAME)
+        else:
+            time.sleep(1)  # Ensure we have time to login
+
+        assert FISHING_USERNAME in online_players(server)
+
+
+def read_chat_messages(server, client):
+    """
+    Return the chat messages the client sent to `server`, while `client` runs
+
+    `client` is a context manager starting the client.
+    """
+    if isinstance(server, FakeServer):
+        with client:
+            player = server.wait_for_player(FISHING_USERNAME)
+            # The messages are sent right after casting the rod. Give the client
+            # the time a real server gets before the messages are read
+            player.wait_for(lambda player: player.use_item_count >= 1)
+            time.sleep(1)
+            with server.changed:
+                return list(player.chat_messages)
 
     SENTINEL_STRING = "AUTOFISH-TESTING-SENTINEL"
 
-    did_message = ("did", "did not")
-    should_message = ("should not", "should")
-
     # Clear output from other tests
     with MCRcon(server.host, server.rcon_password, server.rcon_port) as mcr:
         mcr.command(f"/say START-{SENTINEL_STRING}")
@@ -48,12 +63,7 @@ def test_messages(server, tmp_path, should_greet, should_sleep):
     ):
         pass
 
-    # Start the client
-    options = {"sleep_helper": should_sleep}
-    if not should_greet:
-        options["greet_message"] = ""  # Set to empty string to disable greeting
-
-    with ManagedClient(tmp_path, server, options_override=options):
+    with client:
         time.sleep(1)  # Give the server time to receive the chat packets
 
         with MCRcon(server.host, server.rcon_password, server.rcon_port) as mcr:
@@ -66,24 +76,50 @@ def test_messages(server, tmp_path, should_greet, should_sleep):
             if f"<{FISHING_USERNAME}>" in line:
                 sent_messages.append(line)
 
-        def message_has_been_sent(messages, message):
-            return any(message in m for m in messages)
+    return sent_messages
 
-        if should_greet != message_has_been_sent(
-            sent_messages, DEFAULT_CONFIG["options"]["greet_message"]
-        ):
-            raise RuntimeError(
-                f"Client process {did_message[should_greet]} greet the server when it "
-                f"{should_message[should_greet]} have"
-            )
 
-        if should_sleep != message_has_been_sent(
-            sent_messages, DEFAULT_CONFIG["options"]["sleep_message"]
-        ):
-            raise RuntimeError(
-                f"Client process {did_message[should_sleep]} inform the server of the "
-                f"sleep helper when it {should_message[should_sleep]} have"
-            )
+@pytest.mark.parametrize("should_greet", (False, True))
+@pytest.mark.parametrize("should_sleep", (False, True))
+def test_messages(any_server, tmp_path, should_greet, should_sleep):
+    """Assert that the greet/sleep helper messages are sent according to preference"""
+    server = any_server
+    if server.process is None and not isinstance(server, FakeServer):
+        pytest.skip(
+            "We need to read from the server process to determine if messages were "
+            "sent. This does not work when using an external server for the tests."
+        )
+
+    did_message = ("did", "did not")
+    should_message = ("should not", "should")
+
+    # Start the client
+    options = {"sleep_helper": should_sleep}
+    if not should_greet:
+        options["greet_message"] = ""  # Set to empty string to disable greeting
+
+    sent_messages = read_chat_messages(
+        server, ManagedClient(tmp_path, server, options_override=options)
+    )
+
+    def message_has_been_sent(messages, message):
+        return any(message in m for m in messages)
+
+    if should_greet != message_has_been_sent(
+        sent_messages, DEFAULT_CONFIG["options"]["greet_message"]
+    ):
+        raise RuntimeError(
+            f"Client process {did_message[should_greet]} greet the server when it "
+            f"{should_message[should_greet]} have"
+        )
+
+    if should_sleep != message_has_been_sent(
+        sent_messages, DEFAULT_CONFIG["options"]["sleep_message"]
+    ):
+        raise RuntimeError(
+            f"Client process {did_message[should_sleep]} inform the server of the "
+            f"sleep helper when it {should_message[should_sleep]} have"
+        )
 
 
 def test_bobber_cast_on_login(server, tmp_path, setup_spawn):